@@ -1,18 +1,41 @@
 from flask import Flask, jsonify, request, make_response, session, Response
 from flask_restful import Resource, Api
-from models import Post, Textbook, User, Comment, Watchlist
+from models import Post, Textbook, User, Comment, Watchlist, Notification
+from listings import (
+    list_posts, get_post, parse_embed_comments, posts_query, serialize_post, serialize_posts,
+    watchlist_entries, serialize_watchlist_post,
+)
+from pagination import paginate, parse_limit, wants_pagination
+from streaming import stream_ndjson, wants_stream
+from search import search_posts
+from bulk import create_posts
+from identity_cache import identity_cache, load_cached_user
+from metrics import PROMETHEUS_MIMETYPE, render_metrics
+from logs import configure_logging
+from write_queue import WriteQueueTimeout, insert_row
+from passwords import PasswordHasherBusy
+from events import TooManySubscribers, event_bus, parse_last_event_id, stream_events
+from notifications import mark_all_read, mark_read, notifications_page, notify, unread_count
+from counters import adjust_post_counts, comment_added, forget_user_activity, watchlist_added
+from response_cache import cached, response_cache
 from config import *
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_uploads import configure_uploads, UploadNotAllowed
-from flask_mail import Message
+from mailer import enqueue_digest_items, outbox
+from sqlalchemy.orm import joinedload
 import logging
+import multiprocessing
 from cloudinary.uploader import upload
-from cloudinary.utils import cloudinary_url
 
-logging.basicConfig(level=logging.DEBUG)
+configure_logging(app)
 logger = logging.getLogger(__name__)
 
+# Password hashing workers re-import the main script, and through it this
+# module; only the server process itself dispatches mail.
+if app.config['OUTBOX_DISPATCHER'] and multiprocessing.current_process().name == 'MainProcess':
+    outbox.start()
+
 configure_uploads(app, images)
 
 login_manager = LoginManager()
@@ -20,45 +43,84 @@ login_manager.init_app(app)
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
-
-def send_email(subject, recipients, body):
-    msg = Message(subject, recipients=recipients)
-    msg.body = body
-    mail.send(msg)
+    return load_cached_user(int(user_id))
+
+# List responses carry the tags of every entity they embed as well as their
+# ``*:list`` tag, so a write that invalidates ``post:5`` also drops each
+# list showing post 5. The list tags cover rows being added or removed.
+
+def _rows(data):
+    return data['items'] if isinstance(data, dict) else data
+
+def _embedded_post_tags(post):
+    tags = {f"post:{post['id']}", f"textbook:{post['textbook_id']}", f"user:{post['user_id']}"}
+    tags.update(f"user:{comment['user_id']}" for comment in post.get('comments', ()))
+    return tags
+
+def _embedded_comment_tags(comment):
+    return {f"post:{comment['post_id']}", f"user:{comment['user_id']}", f"textbook:{comment['post']['textbook_id']}"}
+
+def post_tags(kwargs, data):
+    if kwargs.get('post_id') is None:
+        tags = {'posts:list'}
+        for post in _rows(data):
+            tags |= _embedded_post_tags(post)
+        return tags
+    return _embedded_post_tags(data)
+
+def textbook_tags(kwargs, data):
+    if kwargs.get('textbook_id') is None:
+        return {'textbooks:list'} | {f"textbook:{textbook['id']}" for textbook in _rows(data)}
+    return [f"textbook:{data['id']}"]
+
+def comment_tags(kwargs, data):
+    post_id = kwargs.get('post_id')
+    tags = {'comments:list'} if post_id is None else {f"comments:post:{post_id}", f"post:{post_id}"}
+    for comment in _rows(data):
+        tags |= _embedded_comment_tags(comment)
+    return tags
+
+def watchlist_tags(kwargs, data):
+    tags = {f"watchlist:user:{kwargs['user_id']}", f"user:{kwargs['user_id']}"}
+    for post in data:
+        tags |= _embedded_post_tags(post)
+    return tags
+
+def user_tags(kwargs, data):
+    return {'users:list'} | {f"user:{user['id']}" for user in _rows(data)}
 
 @app.route('/')
 def index():
     return '<h1>Project Server</h1>'
+
+@app.route('/metrics')
+def metrics():
+    return Response(render_metrics(), content_type=PROMETHEUS_MIMETYPE)
 class PostResource(Resource):
 
+    @cached(post_tags)
     def get(self, post_id=None):
+        try:
+            embed_comments = parse_embed_comments(request.args.get('embed_comments'))
+        except ValueError as e:
+            return {"message": str(e)}, 400
+
         if post_id is None:
             user_id = request.args.get('user_id')
-            if user_id:
-                posts = Post.query.filter_by(user_id=user_id).all()
-            else:
-                posts = Post.query.all()
-
-            posts_data = []
-            for post in posts:
-                post_data = post.to_dict()
-                post_data['user'] = post.user.to_dict()
-                post_data['textbook'] = post.textbook.to_dict()
-                post_data['comments'] = [comment.to_dict() for comment in post.comments]
-                posts_data.append(post_data)
-            
-            return posts_data, 200
+            query = posts_query(user_id, embed_comments)
+            serialize = lambda posts: serialize_posts(posts, embed_comments)
+            if wants_stream():
+                return stream_ndjson(query, Post.id, serialize, many=True)
+            if wants_pagination():
+                try:
+                    return paginate(query, Post.id, serialize, many=True), 200
+                except ValueError as e:
+                    return {"message": str(e)}, 400
+            return list_posts(user_id=user_id, embed_comments=embed_comments), 200
         else:
-            post = Post.query.get(post_id)
-            if post is None:
+            post_data = get_post(post_id, embed_comments)
+            if post_data is None:
                 return {"message": "Post not found"}, 404
-            
-            post_data = post.to_dict()
-            post_data['user'] = post.user.to_dict()
-            post_data['textbook'] = post.textbook.to_dict()
-            post_data['comments'] = [comment.to_dict() for comment in post.comments]
-            
             return post_data, 200
         
 
@@ -66,8 +128,7 @@ class PostResource(Resource):
         try:
             data = request.form
             files = request.files
-            print("Received data:", data)
-            print("Received files:", files)
+            logger.debug("Creating post", extra={'form_fields': sorted(data.keys()), 'files': sorted(files.keys())})
 
             user_id = data.get('user_id')
             isbn = data.get('isbn')
@@ -87,8 +148,9 @@ class PostResource(Resource):
             if not user:
                 return {"message": "User not found"}, 404
 
+            image_public_id = data.get('image_public_id') or None
             textbook = Textbook.query.filter_by(isbn=isbn).first()
-            if not textbook:
+            if textbook is None:
                 textbook_data = {
                     'isbn': isbn,
                     'title': data.get('title', ''),
@@ -97,43 +159,47 @@ class PostResource(Resource):
                 }
                 textbook = Textbook(**textbook_data)
                 db.session.add(textbook)
-
-            post = Post(user_id=user_id, textbook=textbook, price=price, condition=condition)
-            
-            image_public_id = data.get('image_public_id')
-            if image_public_id:
-                post.img = image_public_id
-            
-            db.session.add(post)
-            db.session.commit()
+                post = Post(user_id=user_id, textbook=textbook, price=price, condition=condition, img=image_public_id)
+                db.session.add(post)
+                db.session.commit()
+                textbook_data = textbook.to_dict()
+            else:
+                # Serialized while loaded; committing the post expires it.
+                textbook_data = textbook.to_dict()
+                post = insert_row(Post, user_id=user_id, textbook_id=textbook.id, price=price,
+                                  condition=condition, img=image_public_id)
+            response_cache.invalidate('posts:list', 'textbooks:list')
 
             post_data = post.to_dict()
-            post_data['textbook'] = textbook.to_dict()
+            post_data['textbook'] = textbook_data
             post_data['user'] = user.to_dict()
-            post_data['image_url'] = post.image_url
 
-            print("Returning post data:", post_data)
+            logger.info("Created post", extra={'post_id': post.id, 'textbook_id': post.textbook_id})
             return post_data, 201
+        except WriteQueueTimeout as e:
+            logger.warning("Write queue timed out creating post", extra={'user_id': user_id})
+            db.session.rollback()
+            return {"message": str(e)}, 503, {'Retry-After': '1'}
         except Exception as e:
-            print("Error creating post:", str(e))
+            logger.exception("Error creating post")
             db.session.rollback()
             return {"message": f"Error creating post: {str(e)}"}, 500
 
     def put(self, post_id):
-        print(f"Attempting to update post with id: {post_id}")
+        logger.debug("Updating post", extra={'post_id': post_id})
         post = Post.query.get(post_id)
         if not post:
-            print(f"Post with id {post_id} not found")
+            logger.info("Post not found for update", extra={'post_id': post_id})
             return {"message": "Post not found"}, 404
 
         if post.user_id != current_user.id:
             return {"message": "Unauthorized"}, 401
 
         data = request.form
-        print("Received data:", data)
+        logger.debug("Updating post fields", extra={'post_id': post_id, 'form_fields': sorted(data.keys())})
 
         if not data:
-            print("No input data provided")
+            logger.warning("No input data provided for post update", extra={'post_id': post_id})
             return {"message": "No input data provided"}, 400
 
         try:
@@ -160,29 +226,41 @@ class PostResource(Resource):
             if image_public_id:
                 post.img = image_public_id
 
-            db.session.commit()
+            # Check for price drop; alerts are queued in the same transaction
+            # and sent by the outbox dispatcher, never from this request.
+            price_dropped = float(post.price) < original_price
+            if price_dropped:
+                watchers = (
+                    db.session.query(User.id, User.email)
+                    .join(Watchlist, Watchlist.user_id == User.id)
+                    .filter(Watchlist.post_id == post_id)
+                    .distinct()
+                    .all()
+                )
+                drop = {'title': textbook.title, 'price': post.price}
+                enqueue_digest_items([email for _, email in watchers], 'price_drop', post.id, drop)
+                notify([user_id for user_id, _ in watchers], 'price_drop', post.id,
+                       f"{textbook.title} dropped to ${post.price}")
 
-            # Check for price drop
-            new_price = float(post.price)
-            if new_price < original_price:
-                watchlist_items = Watchlist.query.filter_by(post_id=post_id).all()
-                for item in watchlist_items:
-                    user = User.query.get(item.user_id)
-                    if user:
-                        subject = f"Price Drop Alert: {post.textbook.title}"
-                        body = f"The price of {post.textbook.title} has dropped to ${post.price}. Check it out now!"
-                        recipients = [user.email]
-                        send_email(subject, recipients, body)
+            db.session.commit()
+            response_cache.invalidate(
+                f"post:{post.id}", f"textbook:{textbook.id}", 'posts:list', 'textbooks:list', 'comments:list'
+            )
+            if price_dropped:
+                outbox.wake()
+                event_bus.publish(
+                    [user_id for user_id, _ in watchers], 'price_drop',
+                    {'post_id': post.id, 'title': textbook.title, 'price': post.price, 'previous_price': original_price},
+                )
 
             post_data = post.to_dict()
             post_data['textbook'] = textbook.to_dict()
-            post_data['image_url'] = post.image_url
 
-            print("Returning updated post data:", post_data)
+            logger.info("Updated post", extra={'post_id': post.id, 'price_dropped': price_dropped})
             return post_data, 200
         except Exception as e:
             db.session.rollback()
-            print("Error updating post:", str(e))
+            logger.exception("Error updating post", extra={'post_id': post_id})
             return {"message": "Error updating post", "error": str(e)}, 500
     
     def delete(self, post_id):
@@ -196,14 +274,51 @@ class PostResource(Resource):
         try:
             db.session.delete(post)
             db.session.commit()
+            response_cache.invalidate(f"post:{post_id}", 'posts:list', 'comments:list')
             return {"message": "Post deleted successfully"}, 200
         except Exception as e:
             db.session.rollback()
             return {"message": "Error deleting post", "error": str(e)}, 500
 
+class BulkPostResource(Resource):
+    def post(self):
+        items = request.get_json(silent=True)
+        if isinstance(items, dict):
+            items = items.get('listings')
+        if not isinstance(items, list) or not items:
+            return {"message": "A JSON array of listings is required"}, 400
+        max_items = app.config['BULK_POSTS_MAX_ITEMS']
+        if len(items) > max_items:
+            return {"message": f"At most {max_items} listings can be created at once"}, 400
+
+        try:
+            results, created = create_posts(items)
+        except Exception as e:
+            db.session.rollback()
+            logger.exception("Error creating posts in bulk")
+            return {"message": f"Error creating posts: {str(e)}"}, 500
+
+        if created:
+            response_cache.invalidate('posts:list', 'textbooks:list')
+        if created == len(items):
+            status = 201
+        elif created:
+            status = 207
+        else:
+            status = 400
+        return {"created": created, "results": results}, status
+
 class TextbookResource(Resource):
+    @cached(textbook_tags)
     def get(self, textbook_id=None):
         if textbook_id is None:
+            if wants_stream():
+                return stream_ndjson(Textbook.query, Textbook.id, Textbook.to_dict)
+            if wants_pagination():
+                try:
+                    return paginate(Textbook.query, Textbook.id, Textbook.to_dict), 200
+                except ValueError as e:
+                    return {"message": str(e)}, 400
             textbooks = Textbook.query.all()
             textbooks_data = [textbook.to_dict() for textbook in textbooks]
             return textbooks_data, 200
@@ -241,6 +356,7 @@ class TextbookResource(Resource):
 
         db.session.add(textbook)
         db.session.commit()
+        response_cache.invalidate('textbooks:list')
 
         return textbook.to_dict(), 201
 
@@ -252,11 +368,18 @@ class TextbookResource(Resource):
 
         db.session.delete(textbook)
         db.session.commit()
+        response_cache.invalidate(f"textbook:{textbook_id}", 'textbooks:list', 'posts:list', 'comments:list')
 
         return {"message": "Textbook deleted successfully"}, 200
 
 class UserResource(Resource):
+    @cached(user_tags)
     def get(self):
+        if wants_pagination():
+            try:
+                return paginate(User.query, User.id, User.to_dict), 200
+            except ValueError as e:
+                return {"message": str(e)}, 400
         users = User.query.all()
         users_data = [user.to_dict() for user in users]
         return users_data, 200
@@ -267,22 +390,34 @@ class UserResource(Resource):
         if not user:
             return {'message': 'User not found.'}, 404
 
+        forget_user_activity(user_id)
         db.session.delete(user)
         db.session.commit()
+        identity_cache.discard(user_id)
+        response_cache.invalidate(
+            f"user:{user_id}", f"watchlist:user:{user_id}", 'users:list', 'posts:list', 'comments:list'
+        )
 
         return {'message': 'User deleted successfully.'}, 200
 
 
 class CommentResource(Resource):
+    @cached(comment_tags)
     def get(self, post_id=None):
-        if post_id is None:
-            comments = Comment.query.all()
-            comments_data = [comment.to_dict() for comment in comments]
-            return comments_data, 200
-        else:
-            comments = Comment.query.filter_by(post_id=post_id).all()
-            comments_data = [comment.to_dict() for comment in comments]
-            return comments_data, 200
+        query = Comment.query.options(joinedload(Comment.user), joinedload(Comment.post))
+        if post_id is not None:
+            query = query.filter_by(post_id=post_id)
+
+        if wants_stream():
+            return stream_ndjson(query, Comment.id, Comment.to_dict)
+        if wants_pagination():
+            try:
+                return paginate(query, Comment.id, Comment.to_dict), 200
+            except ValueError as e:
+                return {"message": str(e)}, 400
+
+        comments_data = [comment.to_dict() for comment in query.all()]
+        return comments_data, 200
 
     def post(self, post_id):
         data = request.get_json()
@@ -299,10 +434,30 @@ class CommentResource(Resource):
             return {"message": "Post not found"}, 404
 
         user = current_user
+        owner_id = post.user_id
+        notify_owner = owner_id != user.id
+        if notify_owner:
+            message = f"{user.name or user.email} commented on your listing for {post.textbook.title}"
+
+        def on_insert(comment):
+            # Runs in whichever session commits the comment (possibly the
+            # write queue's), so the notification commits with it.
+            comment_added(comment)
+            if notify_owner:
+                notify([owner_id], 'comment', post_id, message)
 
-        new_comment = Comment(text=text, user_id=user.id, post_id=post_id)
-        db.session.add(new_comment)
-        db.session.commit()
+        try:
+            new_comment = insert_row(Comment, on_insert=on_insert, text=text, user_id=user.id, post_id=post_id)
+        except WriteQueueTimeout as e:
+            logger.warning("Write queue timed out adding comment", extra={'post_id': post_id})
+            db.session.rollback()
+            return {"message": str(e)}, 503, {'Retry-After': '1'}
+        response_cache.invalidate(f"post:{post_id}", f"comments:post:{post_id}", 'posts:list', 'comments:list')
+        if notify_owner:
+            event_bus.publish([owner_id], 'comment', {
+                'post_id': post_id, 'comment_id': new_comment.id, 'text': text,
+                'user': {'id': user.id, 'name': user.name},
+            })
 
         return new_comment.to_dict(), 201
     
@@ -316,37 +471,45 @@ class CommentResource(Resource):
             return {"message": "Unauthorized"}, 401
 
         try:
+            comment_post_id = comment.post_id
             db.session.delete(comment)
+            adjust_post_counts(comment_post_id, comments=-1)
             db.session.commit()
+            response_cache.invalidate(
+                f"post:{comment_post_id}", f"comments:post:{comment_post_id}", 'posts:list', 'comments:list'
+            )
             return {"message": "Comment deleted successfully"}, 200
         except Exception as e:
             db.session.rollback()
             return {"message": "Error deleting comment", "error": str(e)}, 500
 
 class WatchlistResource(Resource):
+    @cached(watchlist_tags)
     def get(self, user_id):
-        user = User.query.get(user_id)
-        if not user:
+        since = request.args.get('since')
+        limit = request.args.get('limit')
+        try:
+            if since is not None:
+                since = int(since)
+        except ValueError:
+            return {"message": "Since must be an integer."}, 400
+        try:
+            if limit is not None:
+                limit = parse_limit(limit)
+        except ValueError as e:
+            return {"message": str(e)}, 400
+
+        entries = watchlist_entries(user_id, since=since, limit=limit)
+        if entries is None:
             return {"message": "User not found"}, 404
 
-        watchlist_items = Watchlist.query.filter_by(user_id=user_id).all()
-        watchlist_data = []
-
-        for item in watchlist_items:
-            post = Post.query.get(item.post_id)
-            if post:
-                textbook = post.textbook
-                post_data = post.to_dict()
-                post_data['textbook'] = {
-                    'id': textbook.id,
-                    'title': textbook.title,
-                    'author': textbook.author,
-                    'isbn': textbook.isbn
-                }
-                post_data['image_url'] = post.image_url  # Make sure this is included
-                watchlist_data.append(post_data)
+        watchlist_data = [serialize_watchlist_post(post, textbook) for _, post, textbook in entries]
 
-        return watchlist_data, 200
+        headers = {}
+        if entries:
+            # Lets the client ask for only what was added later via ?since=
+            headers['X-Watchlist-Cursor'] = str(entries[-1][0])
+        return watchlist_data, 200, headers
 
     def post(self, user_id):
         try:
@@ -376,15 +539,32 @@ class WatchlistResource(Resource):
             if watchlist_item:
                 return {"message": "Item already in watchlist"}, 400
 
-            new_watchlist_item = Watchlist(user_id=user_id, post_id=post_id, textbook_id=textbook_id)
+            owner_id = post.user_id
+            notify_owner = owner_id != user_id
+            message = f"Someone added your listing for {textbook.title} to their watchlist"
 
-            db.session.add(new_watchlist_item)
-            db.session.commit()
+            def on_insert(entry):
+                # Runs in whichever session commits the entry, so the
+                # notification commits with it.
+                watchlist_added(entry)
+                if notify_owner:
+                    notify([owner_id], 'watch', post_id, message)
+
+            new_watchlist_item = insert_row(
+                Watchlist, on_insert=on_insert, user_id=user_id, post_id=post_id, textbook_id=textbook_id
+            )
+            response_cache.invalidate(f"watchlist:user:{user_id}", f"post:{post_id}", 'posts:list', 'comments:list')
+            if notify_owner:
+                event_bus.publish([owner_id], 'watch', {'post_id': post_id, 'user_id': user_id})
 
             return new_watchlist_item.to_dict(), 201
+        except WriteQueueTimeout as e:
+            db.session.rollback()
+            logger.warning("Write queue timed out adding to watchlist", extra={'user_id': user_id})
+            return {"message": str(e)}, 503, {'Retry-After': '1'}
         except Exception as e:
             db.session.rollback()
-            logging.error(f"Error adding item to watchlist: {str(e)}")
+            logger.exception("Error adding item to watchlist", extra={'user_id': user_id})
             return {"message": "Internal Server Error", "error": str(e)}, 500
     def delete(self, user_id, post_id):
         try:
@@ -393,13 +573,30 @@ class WatchlistResource(Resource):
                 return {"message": "Watchlist item not found"}, 404
 
             db.session.delete(watchlist_item)
+            adjust_post_counts(post_id, watchers=-1)
             db.session.commit()
+            response_cache.invalidate(f"watchlist:user:{user_id}", f"post:{post_id}", 'posts:list', 'comments:list')
 
             return {"message": "Watchlist item deleted successfully"}, 200
         except Exception as e:
             db.session.rollback()
-            logging.error(f"Error deleting watchlist item: {str(e)}")
+            logger.exception("Error deleting watchlist item", extra={'user_id': user_id, 'post_id': post_id})
             return {"message": "Internal Server Error", "error": str(e)}, 500
+class SearchResource(Resource):
+    def get(self):
+        q = request.args.get('q', '')
+        subject = request.args.get('subject', '')
+        if not q.strip() and not subject.strip():
+            return {"message": "A search term or subject is required"}, 400
+
+        try:
+            limit = parse_limit(request.args.get('limit'))
+        except ValueError as e:
+            return {"message": str(e)}, 400
+
+        posts = search_posts(q, subject, limit=limit)
+        return [serialize_post(post) for post in posts], 200
+
 class LogoutResource(Resource):
     def post(self):
         logout_user()
@@ -409,6 +606,66 @@ class LogoutResource(Resource):
         response.set_cookie('remember_token', '', expires=0)  # Expire the remember token
         return response
 
+class UserEventsResource(Resource):
+    def get(self, user_id):
+        if not current_user.is_authenticated or current_user.id != user_id:
+            return {"message": "Unauthorized"}, 401
+        last_event_id = parse_last_event_id(
+            request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        )
+        try:
+            return stream_events(user_id, last_event_id)
+        except TooManySubscribers as e:
+            return {"message": str(e)}, 503, {'Retry-After': str(app.config['EVENTS_RETRY_MS'] // 1000 or 1)}
+
+
+class NotificationListResource(Resource):
+    def get(self, user_id):
+        if not current_user.is_authenticated or current_user.id != user_id:
+            return {"message": "Unauthorized"}, 401
+        try:
+            page = notifications_page(user_id)
+        except ValueError as e:
+            return {"message": str(e)}, 400
+        page['unread_count'] = unread_count(user_id)
+        return page, 200
+
+    def patch(self, user_id):
+        if not current_user.is_authenticated or current_user.id != user_id:
+            return {"message": "Unauthorized"}, 401
+        data = request.get_json()
+        if not data or data.get('read') is not True:
+            return {"message": "Only {\"read\": true} is supported"}, 400
+        marked = mark_all_read(user_id)
+        db.session.commit()
+        return {"marked": marked, "unread_count": unread_count(user_id)}, 200
+
+
+class UnreadCountResource(Resource):
+    def get(self, user_id):
+        if not current_user.is_authenticated or current_user.id != user_id:
+            return {"message": "Unauthorized"}, 401
+        count = unread_count(user_id)
+        if count is None:
+            return {"message": "User not found"}, 404
+        return {"unread_count": count}, 200
+
+
+class NotificationResource(Resource):
+    def patch(self, notification_id):
+        notification = db.session.get(Notification, notification_id)
+        if not notification:
+            return {"message": "Notification not found"}, 404
+        if not current_user.is_authenticated or notification.user_id != current_user.id:
+            return {"message": "Unauthorized"}, 401
+        data = request.get_json()
+        if not data or data.get('read') is not True:
+            return {"message": "Only {\"read\": true} is supported"}, 400
+        mark_read(notification)
+        db.session.commit()
+        return notification.to_dict(), 200
+
+
 class CheckSessionResource(Resource):
     def get(self):
         if current_user.is_authenticated:
@@ -441,11 +698,17 @@ class SignupResource(Resource):
             return {"message": "Email already exists"}, 400
 
         new_user = User(email=email, name=name)
-        new_user.password_hash = password  # This will use the setter method to hash the password
+        try:
+            new_user.password_hash = password  # This will use the setter method to hash the password
+        except PasswordHasherBusy:
+            logger.warning("Password hashing pool saturated; rejecting signup")
+            return {"message": "Too many requests, please retry shortly"}, 503, {'Retry-After': '1'}
 
         try:
             db.session.add(new_user)
             db.session.commit()
+            identity_cache.discard(new_user.id)
+            response_cache.invalidate('users:list')
             login_user(new_user)
             logger.info(f"New user signed up and logged in: {email}")
             return new_user.to_dict(), 201
@@ -473,7 +736,17 @@ class LoginResource(Resource):
 
         user = User.query.filter_by(email=email).first()
 
-        if user and user.authenticate(password):
+        try:
+            authenticated = user is not None and user.authenticate(password)
+        except PasswordHasherBusy:
+            logger.warning("Password hashing pool saturated; rejecting login")
+            return {"message": "Too many login attempts, please retry shortly"}, 503, {'Retry-After': '1'}
+
+        if authenticated:
+            if db.session.is_modified(user):
+                # authenticate() upgraded the hash to the current work factor
+                db.session.commit()
+                identity_cache.discard(user.id)
             login_user(user, remember=remember)  # Add remember parameter
             logger.info(f"User {email} logged in successfully with remember={remember}")
             return user.to_dict(), 200
@@ -489,6 +762,7 @@ class LoginResource(Resource):
 
 
 api.add_resource(PostResource, '/posts', '/posts/<int:post_id>')
+api.add_resource(BulkPostResource, '/posts/bulk')
 api.add_resource(TextbookResource, '/textbooks', '/textbooks/<int:textbook_id>')
 api.add_resource(CommentResource, '/comments', 
                 '/posts/<int:post_id>/comments',
@@ -499,5 +773,10 @@ api.add_resource(CheckSessionResource, '/check_session')
 api.add_resource(SignupResource, '/signup')
 api.add_resource(WatchlistResource, '/users/<int:user_id>/watchlist', '/users/<int:user_id>/watchlist/<int:post_id>')
 api.add_resource(UserResource, '/users', '/users/<int:user_id>')
+api.add_resource(UserEventsResource, '/users/<int:user_id>/events')
+api.add_resource(NotificationListResource, '/users/<int:user_id>/notifications')
+api.add_resource(UnreadCountResource, '/users/<int:user_id>/notifications/unread_count')
+api.add_resource(NotificationResource, '/notifications/<int:notification_id>')
+api.add_resource(SearchResource, '/search')
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""Endpoint latency benchmark with a baseline regression check.
+
+For each dataset size a worker process builds a throwaway SQLite database
+from the migrations, fills it with ``seed.py --scale`` data and runs SCRIPT
+through the Flask test client. The script runs once to warm up, then
+``--iterations`` more times. The worker records per-request latency
+percentiles, SQL statements per request and peak Python memory (one
+tracemalloc pass). With ``--server`` it also serves the app from a threaded
+werkzeug server and hits the read-only steps from ``--concurrency`` client
+threads.
+
+Every URL registered through ``api.add_resource`` must be exercised by
+SCRIPT; the run fails if a new route isn't. It also fails, without touching
+the baseline, if any step answers with anything but a 2xx, since its timings
+would then describe an error page.
+
+    python benchmarks/bench_endpoints.py --sizes 1000 10000 --save-baseline
+    python benchmarks/bench_endpoints.py --sizes 1000 10000   # compares against the baseline
+
+Results are written as JSON (``--output``). Against ``--baseline`` a step
+regresses when it issues more statements than before, when its p95 grows by
+more than ``--tolerance`` (plus ``--slack-ms``), or when its peak memory grows
+by more than ``--tolerance`` (plus 64 KiB). Timings are machine-specific, so
+record the baseline on the machine that runs the comparison.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_SIZES = (1000, 10000)
+PASSWORD = 'password123'
+MEMORY_SLACK = 64 * 1024
+
+# (label, method, path, request kwargs, capture). Paths and kwargs are
+# formatted with the ids picked after seeding plus ``iteration``; ``capture``
+# names an id to take from the JSON response's ``id`` for later steps. The
+# order matters: signup logs the new user in, so it is deleted before the
+# seeded owner logs in, and logout comes last.
+SCRIPT = [
+    ('signup', 'POST', '/signup',
+     {'json': {'email': 'bench{iteration}@bench.edu', 'password': PASSWORD, 'name': 'Bench'}}, 'new_user_id'),
+    ('delete user', 'DELETE', '/users/{new_user_id}', {}, None),
+    ('login page', 'GET', '/login', {}, None),
+    ('login', 'POST', '/login', {'json': {'email': '{owner_email}', 'password': PASSWORD}}, None),
+    ('check session', 'GET', '/check_session', {}, None),
+    ('list posts', 'GET', '/posts', {}, None),
+    ('list posts, paginated', 'GET', '/posts?limit=50', {}, None),
+    ('list posts, latest comments', 'GET', '/posts?limit=50&embed_comments=3', {}, None),
+    ('list posts by user', 'GET', '/posts?user_id={owner_id}', {}, None),
+    ('get post', 'GET', '/posts/{post_id}', {}, None),
+    ('create post', 'POST', '/posts',
+     {'data': {'user_id': '{owner_id}', 'isbn': '{isbn}', 'price': '40', 'condition': 'Good'}}, 'new_post_id'),
+    ('update post', 'PUT', '/posts/{new_post_id}', {'data': {'condition': 'Like New'}}, None),
+    ('delete post', 'DELETE', '/posts/{new_post_id}', {}, None),
+    ('bulk create posts', 'POST', '/posts/bulk',
+     {'json': [{'user_id': '{owner_id}', 'isbn': '{isbn}', 'price': '30', 'condition': 'Good'}] * 10}, None),
+    ('list textbooks', 'GET', '/textbooks', {}, None),
+    ('list textbooks, paginated', 'GET', '/textbooks?limit=50', {}, None),
+    ('get textbook', 'GET', '/textbooks/{textbook_id}', {}, None),
+    ('create textbook', 'POST', '/textbooks',
+     {'data': {'author': 'Bench', 'title': 'Bench', 'isbn': '{new_isbn}'}}, 'new_textbook_id'),
+    ('delete textbook', 'DELETE', '/textbooks/{new_textbook_id}', {}, None),
+    ('list comments, paginated', 'GET', '/comments?limit=50', {}, None),
+    ('list post comments', 'GET', '/posts/{post_id}/comments', {}, None),
+    ('add comment', 'POST', '/posts/{post_id}/comments', {'json': {'text': 'Still available?'}}, 'comment_id'),
+    ('delete comment', 'DELETE', '/posts/{post_id}/comments/{comment_id}', {}, None),
+    ('get watchlist', 'GET', '/users/{owner_id}/watchlist', {}, None),
+    ('add to watchlist', 'POST', '/users/{owner_id}/watchlist',
+     {'json': {'post_id': '{other_post_id}', 'textbook_id': '{other_textbook_id}'}}, None),
+    ('remove from watchlist', 'DELETE', '/users/{owner_id}/watchlist/{other_post_id}', {}, None),
+    ('list notifications', 'GET', '/users/{owner_id}/notifications?limit=20', {}, None),
+    ('unread notification count', 'GET', '/users/{owner_id}/notifications/unread_count', {}, None),
+    ('mark notification read', 'PATCH', '/notifications/{notification_id}', {'json': {'read': True}}, None),
+    ('mark all notifications read', 'PATCH', '/users/{owner_id}/notifications', {'json': {'read': True}}, None),
+    ('list users, paginated', 'GET', '/users?limit=50', {}, None),
+    ('search', 'GET', '/search?q=biology', {}, None),
+    ('search by isbn prefix', 'GET', '/search?q=978000', {}, None),
+    ('logout', 'POST', '/logout', {}, None),
+]
+
+# Read-only steps that need no session; these are what --server replays.
+SERVER_STEPS = [
+    'list posts, paginated', 'get post', 'list textbooks, paginated', 'get textbook',
+    'list post comments', 'get watchlist', 'search',
+]
+
+# Registered routes SCRIPT leaves out: the SSE stream never finishes, so it
+# can't be timed as a request.
+UNSCRIPTED = {'/users/<int:user_id>/events'}
+
+
+def fill(value, ids):
+    if isinstance(value, str):
+        return value.format(**ids)
+    if isinstance(value, dict):
+        return {key: fill(item, ids) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill(item, ids) for item in value]
+    return value
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies):
+    return {
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'samples': len(latencies),
+    }
+
+
+def check_coverage(app, api):
+    """Every URL registered via api.add_resource must appear in SCRIPT."""
+    # Api(app) registers its resources on the app straight away and leaves
+    # api.resources empty, so read the routes back from the URL map.
+    registered = {rule.rule for rule in app.url_map.iter_rules() if rule.endpoint in api.endpoints}
+    registered -= UNSCRIPTED
+    covered = set()
+    for _, _, path, _, _ in SCRIPT:
+        path = path.split('?')[0]
+        for url in registered:
+            parts, wanted = url.strip('/').split('/'), path.strip('/').split('/')
+            if len(parts) == len(wanted) and all(p == w or p.startswith('<') for p, w in zip(parts, wanted)):
+                covered.add(url)
+    return sorted(registered - covered)
+
+
+def pick_ids(db, models, notify):
+    User, Textbook, Post, Watchlist = models
+    owner = db.session.get(User, 1)
+    post = Post.query.filter_by(user_id=owner.id).order_by(Post.id).first()
+    other = Post.query.filter(Post.user_id != owner.id).order_by(Post.id).first()
+    Watchlist.query.filter_by(user_id=owner.id, post_id=other.id).delete()
+    notification, = notify([owner.id], 'comment', other.id, 'Bench notification')
+    db.session.commit()
+    return {
+        'owner_id': owner.id,
+        'owner_email': owner.email,
+        'post_id': post.id,
+        'textbook_id': post.textbook_id,
+        'isbn': db.session.get(Textbook, post.textbook_id).isbn,
+        'other_post_id': other.id,
+        'other_textbook_id': other.textbook_id,
+        'notification_id': notification.id,
+    }
+
+
+def run_script(client, ids, iteration, record):
+    """Run SCRIPT once; returns ``{label: status}`` for steps that didn't get a 2xx."""
+    ids = dict(ids, iteration=iteration, new_isbn=9799000000000 + iteration)
+    failed = {}
+    for label, method, path, kwargs, capture in SCRIPT:
+        record.before(label)
+        started = time.perf_counter()
+        response = client.open(fill(path, ids), method=method, **fill(kwargs, ids))
+        elapsed = time.perf_counter() - started
+        response.get_data()
+        record.after(label, elapsed, response.status_code)
+        if not 200 <= response.status_code < 300:
+            failed.setdefault(label, response.status_code)
+        if capture:
+            ids[capture] = (response.get_json() or {}).get('id')
+    return failed
+
+
+class Recorder:
+    def __init__(self, statements):
+        self.statements = statements
+        self.latencies = {}
+        self.queries = {}
+        self.statuses = {}
+        self._mark = 0
+
+    def before(self, label):
+        self._mark = len(self.statements)
+
+    def after(self, label, elapsed, status):
+        self.latencies.setdefault(label, []).append(elapsed)
+        self.queries.setdefault(label, []).append(len(self.statements) - self._mark)
+        self.statuses[label] = status
+
+
+class MemoryRecorder(Recorder):
+    def __init__(self):
+        super().__init__([])
+        self.peaks = {}
+
+    def before(self, label):
+        tracemalloc.start()
+
+    def after(self, label, elapsed, status):
+        self.peaks[label] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+
+def serve_and_hammer(app, ids, seconds_per_step, concurrency):
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f'http://127.0.0.1:{server.server_port}'
+    steps = {label: path for label, method, path, _, _ in SCRIPT if label in SERVER_STEPS}
+    results = {}
+    try:
+        for label, path in steps.items():
+            url = base + fill(path, ids)
+            deadline = time.perf_counter() + seconds_per_step
+
+            def client_loop(_):
+                latencies = []
+                errors = 0
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        with urlopen(url) as response:
+                            response.read()
+                    except HTTPError as e:
+                        e.read()
+                        errors += 1
+                    latencies.append(time.perf_counter() - started)
+                return latencies, errors
+
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                chunks = list(pool.map(client_loop, range(concurrency)))
+            latencies = [value for chunk, _ in chunks for value in chunk]
+            results[label] = dict(
+                summarize(latencies),
+                rps=round(len(latencies) / seconds_per_step, 1),
+                errors=sum(errors for _, errors in chunks),
+            )
+    finally:
+        server.shutdown()
+    return results
+
+
+def worker(args):
+    """Seed one database and benchmark it; runs in its own process."""
+    sys.path.insert(0, SERVER_DIR)
+    from sqlalchemy import event
+    from flask_migrate import upgrade
+    from app import app, api
+    from config import db
+    from models import User, Textbook, Post, Watchlist
+    from notifications import notify
+    import seed
+
+    missing = check_coverage(app, api)
+    if missing:
+        raise SystemExit(f"Routes not exercised by SCRIPT: {', '.join(missing)}")
+
+    with app.app_context():
+        upgrade(directory=os.path.join(SERVER_DIR, 'migrations'))
+        seed.seed_scale(args.size, seed=args.seed, cover_ids=['textbook_covers/bench'])
+        ids = pick_ids(db, (User, Textbook, Post, Watchlist), notify)
+        engine = db.engine
+
+    statements = []
+    main_thread = threading.get_ident()
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == main_thread:
+            statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', count)
+    client = app.test_client()
+    failed = run_script(client, ids, 0, Recorder(statements))
+    record = Recorder(statements)
+    for iteration in range(1, args.iterations + 1):
+        failed = dict(run_script(client, ids, iteration, record), **failed)
+    memory = MemoryRecorder()
+    failed = dict(run_script(client, ids, args.iterations + 1, memory), **failed)
+    event.remove(engine, 'before_cursor_execute', count)
+
+    steps = {}
+    for label, latencies in record.latencies.items():
+        queries = sorted(record.queries[label])
+        steps[label] = dict(
+            summarize(latencies),
+            queries=queries[len(queries) // 2],
+            peak_kb=round(memory.peaks[label] / 1024, 1),
+            status=failed.get(label, record.statuses[label]),
+        )
+    result = {'size': args.size, 'iterations': args.iterations, 'steps': steps, 'failed': failed}
+    if args.server:
+        result['server'] = serve_and_hammer(app, ids, args.server_seconds, args.concurrency)
+        for label, step in result['server'].items():
+            if step['errors']:
+                failed.setdefault('server: ' + label, 'HTTP error')
+    with open(args.worker_output, 'w') as f:
+        json.dump(result, f)
+
+
+def run_size(size, args):
+    with tempfile.TemporaryDirectory(prefix='bench-endpoints-') as tmp:
+        output = os.path.join(tmp, 'result.json')
+        env = dict(
+            os.environ,
+            DATABASE_URL='sqlite:///' + os.path.join(tmp, 'bench.db'),
+            RESPONSE_CACHE_ENABLED='1' if args.cache else '0',
+            OUTBOX_DISPATCHER='0',
+        )
+        command = [
+            sys.executable, os.path.abspath(__file__), '--worker', '--size', str(size),
+            '--seed', str(args.seed), '--iterations', str(args.iterations), '--worker-output', output,
+            '--server-seconds', str(args.server_seconds), '--concurrency', str(args.concurrency),
+        ]
+        if args.server:
+            command.append('--server')
+        started = time.perf_counter()
+        proc = subprocess.run(command, cwd=SERVER_DIR, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            sys.stderr.write(proc.stderr[-4000:])
+            raise SystemExit(f"Benchmark worker for size {size} failed")
+        with open(output) as f:
+            result = json.load(f)
+        result['wall_seconds'] = round(time.perf_counter() - started, 1)
+        return result
+
+
+def print_result(result):
+    print(f"\n== {result['size']:,} posts ({result['iterations']} iterations, {result['wall_seconds']}s) ==")
+    print(f"{'step':28} {'status':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'peak KiB':>9}")
+    for label, step in result['steps'].items():
+        mark = '!' if label in result['failed'] else ' '
+        print(f"{mark}{label:27} {step['status']:>6} {step['p50_ms']:>9.2f} {step['p95_ms']:>9.2f} "
+              f"{step['p99_ms']:>9.2f} {step['queries']:>8} {step['peak_kb']:>9.1f}")
+    for label, step in result.get('server', {}).items():
+        print(f"{'server: ' + label:28} {'':>6} {step['p50_ms']:>9.2f} {step['p95_ms']:>9.2f} "
+              f"{step['p99_ms']:>9.2f} {step['rps']:>8} rps {step['errors']} errors")
+
+
+def regressions(results, baseline, tolerance, slack_ms):
+    problems = []
+    for size, result in results.items():
+        previous = baseline.get(size)
+        if previous is None:
+            continue
+        for label, step in result['steps'].items():
+            before = previous['steps'].get(label)
+            if before is None or label in result['failed']:
+                continue
+            if step['queries'] > before['queries']:
+                problems.append(f"{size} {label}: {before['queries']} -> {step['queries']} statements")
+            if step['p95_ms'] > before['p95_ms'] * (1 + tolerance) + slack_ms:
+                problems.append(f"{size} {label}: p95 {before['p95_ms']:.2f} -> {step['p95_ms']:.2f} ms")
+            if step['peak_kb'] * 1024 > before['peak_kb'] * 1024 * (1 + tolerance) + MEMORY_SLACK:
+                problems.append(f"{size} {label}: peak {before['peak_kb']:.0f} -> {step['peak_kb']:.0f} KiB")
+    return problems
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="posts per dataset")
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--cache', action='store_true', help="leave the response cache on")
+    parser.add_argument('--server', action='store_true', help="also benchmark a threaded werkzeug server")
+    parser.add_argument('--server-seconds', type=float, default=3.0, help="load time per step with --server")
+    parser.add_argument('--concurrency', type=int, default=8, help="client threads with --server")
+    parser.add_argument('--output', default='bench_endpoints.json', help="where to write the results")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.5, help="allowed relative p95/memory growth")
+    parser.add_argument('--slack-ms', type=float, default=2.0, help="absolute p95 growth always allowed")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--worker-output', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.worker:
+        worker(args)
+        return 0
+
+    results = {}
+    for size in args.sizes:
+        result = run_size(size, args)
+        results[str(size)] = result
+        print_result(result)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    failed = [(size, label, status) for size, result in results.items() for label, status in result['failed'].items()]
+    if failed:
+        print(f"\n{len(failed)} step(s) did not return 2xx (marked !); their numbers are not comparable:")
+        for size, label, status in failed:
+            print(f"  {size} {label}: {status}")
+        return 1
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one.")
+        return 0
+
+    with open(args.baseline) as f:
+        problems = regressions(results, json.load(f), args.tolerance, args.slack_ms)
+    if problems:
+        print(f"\n{len(problems)} regression(s) against {args.baseline}:")
+        for problem in problems:
+            print('  ' + problem)
+        return 1
+    print(f"No regressions against {args.baseline}.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Reader/writer throughput under each engine profile.
+
+For every profile in ``--profiles`` a worker process builds a SQLite
+database from the migrations, seeds it with ``seed.py --scale`` data and
+runs ``--readers`` threads doing GET /posts/<id> and GET /posts?limit=20
+alongside ``--writers`` threads posting comments, for ``--seconds``. Each
+thread has its own test client and logged-in session. Failed requests
+(e.g. "database is locked") are counted as errors. A ``+coalesced``
+suffix (e.g. ``tuned+coalesced``) runs the profile with WRITE_COALESCING=1.
+
+    python benchmarks/bench_engine.py
+    python benchmarks/bench_engine.py --readers 16 --writers 4 --seconds 20
+    python benchmarks/bench_engine.py --profiles tuned tuned+coalesced
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = 'password123'
+
+
+def worker(args):
+    sys.path.insert(0, SERVER_DIR)
+    from flask_migrate import upgrade
+    from app import app
+    from config import db
+    from models import User
+    import seed
+
+    with app.app_context():
+        upgrade(directory=os.path.join(SERVER_DIR, 'migrations'))
+        seed.seed_scale(args.posts, seed=42)
+        emails = [email for (email,) in db.session.query(User.email).order_by(User.id).limit(args.writers)]
+        journal_mode = db.session.connection().exec_driver_sql('PRAGMA journal_mode').scalar()
+
+    deadline = None
+    start = threading.Barrier(args.readers + args.writers + 1)
+    counts = {'reads': 0, 'writes': 0, 'read_errors': 0, 'write_errors': 0}
+    lock = threading.Lock()
+
+    def tally(key):
+        with lock:
+            counts[key] += 1
+
+    def reader(index):
+        rng = random.Random(index)
+        client = app.test_client()
+        start.wait()
+        while time.perf_counter() < deadline:
+            if rng.random() < 0.5:
+                path = f'/posts/{rng.randint(1, args.posts)}'
+            else:
+                path = '/posts?limit=20'
+            response = client.get(path)
+            tally('reads' if response.status_code == 200 else 'read_errors')
+
+    def writer(index):
+        rng = random.Random(1000 + index)
+        client = app.test_client()
+        client.post('/login', json={'email': emails[index], 'password': PASSWORD})
+        start.wait()
+        while time.perf_counter() < deadline:
+            response = client.post(f'/posts/{rng.randint(1, args.posts)}/comments', json={'text': 'Still available?'})
+            tally('writes' if response.status_code == 201 else 'write_errors')
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    deadline = time.perf_counter() + args.seconds
+    start.wait()
+    for thread in threads:
+        thread.join()
+
+    result = dict(counts)
+    result['reads_per_second'] = round(counts['reads'] / args.seconds, 1)
+    result['writes_per_second'] = round(counts['writes'] / args.seconds, 1)
+    result['journal_mode'] = journal_mode
+    with open(args.worker_output, 'w') as f:
+        json.dump(result, f)
+
+
+def run_profile(profile, args):
+    engine_profile, _, variant = profile.partition('+')
+    with tempfile.TemporaryDirectory(prefix='bench-engine-') as tmp:
+        output = os.path.join(tmp, 'result.json')
+        env = dict(
+            os.environ,
+            DATABASE_URL='sqlite:///' + os.path.join(tmp, 'bench.db'),
+            DB_ENGINE_PROFILE=engine_profile,
+            WRITE_COALESCING='1' if variant == 'coalesced' else '0',
+            RESPONSE_CACHE_ENABLED='0',
+            OUTBOX_DISPATCHER='0',
+            LOG_LEVEL='ERROR',
+        )
+        command = [
+            sys.executable, os.path.abspath(__file__), '--worker', '--worker-output', output,
+            '--posts', str(args.posts), '--readers', str(args.readers),
+            '--writers', str(args.writers), '--seconds', str(args.seconds),
+        ]
+        proc = subprocess.run(command, cwd=SERVER_DIR, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            sys.stderr.write(proc.stderr[-4000:])
+            raise SystemExit(f"Benchmark worker for profile {profile} failed")
+        with open(output) as f:
+            return json.load(f)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', nargs='+', default=['default', 'tuned'])
+    parser.add_argument('--posts', type=int, default=5000, help="size of the seeded dataset")
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--worker-output', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.worker:
+        worker(args)
+        return 0
+
+    print(f"{args.readers} readers, {args.writers} writers, {args.seconds}s, {args.posts:,} posts")
+    print(f"{'profile':16} {'journal':>8} {'reads/s':>9} {'writes/s':>9} {'read err':>9} {'write err':>10}")
+    for profile in args.profiles:
+        result = run_profile(profile, args)
+        print(f"{profile:16} {result['journal_mode']:>8} {result['reads_per_second']:>9} "
+              f"{result['writes_per_second']:>9} {result['read_errors']:>9} {result['write_errors']:>10}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
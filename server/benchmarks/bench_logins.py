@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Login throughput and concurrent read latency, inline vs. pooled bcrypt.
+
+For every mode in ``--modes`` a worker process builds a SQLite database
+from the migrations, seeds it with ``seed.py --scale`` data and runs
+``--logins`` threads posting to /login alongside ``--readers`` threads
+doing GET /posts/<id>, for ``--seconds``. ``inline`` hashes on the request
+thread (PASSWORD_HASH_WORKERS=0); ``pool`` uses the bcrypt process pool
+with ``--workers`` processes. Logins refused with 503 by the pool's
+PASSWORD_HASH_MAX_PENDING limit are counted as rejected.
+
+    python benchmarks/bench_logins.py
+    python benchmarks/bench_logins.py --logins 16 --workers 4 --rounds 12
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = 'password123'
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def worker(args):
+    sys.path.insert(0, SERVER_DIR)
+    from flask_migrate import upgrade
+    from app import app
+    from config import db
+    from models import User
+    import seed
+
+    with app.app_context():
+        upgrade(directory=os.path.join(SERVER_DIR, 'migrations'))
+        seed.seed_scale(args.posts, seed=42)
+        emails = [email for (email,) in db.session.query(User.email).order_by(User.id).limit(args.logins)]
+
+    deadline = None
+    start = threading.Barrier(args.logins + args.readers + 1)
+    counts = {'logins': 0, 'rejected': 0, 'login_errors': 0, 'reads': 0}
+    read_latencies = []
+    lock = threading.Lock()
+
+    def tally(key, latency=None):
+        with lock:
+            counts[key] += 1
+            if latency is not None:
+                read_latencies.append(latency)
+
+    def login(index):
+        client = app.test_client()
+        start.wait()
+        while time.perf_counter() < deadline:
+            response = client.post('/login', json={'email': emails[index], 'password': PASSWORD})
+            if response.status_code == 200:
+                tally('logins')
+            elif response.status_code == 503:
+                tally('rejected')
+            else:
+                tally('login_errors')
+
+    def reader(index):
+        rng = random.Random(index)
+        client = app.test_client()
+        start.wait()
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            client.get(f'/posts/{rng.randint(1, args.posts)}')
+            tally('reads', time.perf_counter() - started)
+
+    threads = [threading.Thread(target=login, args=(i,)) for i in range(args.logins)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    for thread in threads:
+        thread.start()
+    deadline = time.perf_counter() + args.seconds
+    start.wait()
+    for thread in threads:
+        thread.join()
+
+    result = dict(counts)
+    result['logins_per_second'] = round(counts['logins'] / args.seconds, 1)
+    result['read_p50_ms'] = round(statistics.median(read_latencies) * 1000, 1) if read_latencies else 0.0
+    result['read_p95_ms'] = round(percentile(read_latencies, 0.95) * 1000, 1)
+    with open(args.worker_output, 'w') as f:
+        json.dump(result, f)
+
+
+def run_mode(mode, args):
+    with tempfile.TemporaryDirectory(prefix='bench-logins-') as tmp:
+        output = os.path.join(tmp, 'result.json')
+        env = dict(
+            os.environ,
+            DATABASE_URL='sqlite:///' + os.path.join(tmp, 'bench.db'),
+            BCRYPT_LOG_ROUNDS=str(args.rounds),
+            PASSWORD_HASH_WORKERS='0' if mode == 'inline' else str(args.workers),
+            RESPONSE_CACHE_ENABLED='0',
+            OUTBOX_DISPATCHER='0',
+            LOG_LEVEL='ERROR',
+        )
+        command = [
+            sys.executable, os.path.abspath(__file__), '--worker', '--worker-output', output,
+            '--posts', str(args.posts), '--logins', str(args.logins),
+            '--readers', str(args.readers), '--seconds', str(args.seconds),
+        ]
+        proc = subprocess.run(command, cwd=SERVER_DIR, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            sys.stderr.write(proc.stderr[-4000:])
+            raise SystemExit(f"Benchmark worker for mode {mode} failed")
+        with open(output) as f:
+            return json.load(f)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', choices=['inline', 'pool'], default=['inline', 'pool'])
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1), help="bcrypt processes in pool mode")
+    parser.add_argument('--rounds', type=int, default=12, help="BCRYPT_LOG_ROUNDS")
+    parser.add_argument('--posts', type=int, default=2000, help="size of the seeded dataset")
+    parser.add_argument('--logins', type=int, default=8, help="threads posting to /login")
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--worker-output', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.worker:
+        worker(args)
+        return 0
+
+    print(f"{args.logins} login threads, {args.readers} readers, {args.seconds}s, "
+          f"cost {args.rounds}, {args.workers} pool workers")
+    print(f"{'mode':8} {'logins/s':>9} {'rejected':>9} {'GET p50 ms':>11} {'GET p95 ms':>11} {'reads':>7}")
+    for mode in args.modes:
+        result = run_mode(mode, args)
+        print(f"{mode:8} {result['logins_per_second']:>9} {result['rejected']:>9} "
+              f"{result['read_p50_ms']:>11} {result['read_p95_ms']:>11} {result['reads']:>7}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
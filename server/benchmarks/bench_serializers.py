@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Compare the compiled serializers against SerializerMixin.to_dict.
+
+Builds transient model instances in memory (no database needed), checks that
+both paths produce the same JSON, key order included, then times each one
+per model.
+
+    python benchmarks/bench_serializers.py
+    python benchmarks/bench_serializers.py --sizes 1000 10000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy_serializer import SerializerMixin
+from models import User, Textbook, Post, Comment
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+
+def build(size):
+    users = [User(id=i, email=f'user{i}@bench.edu', name=f'User {i}') for i in range(1, 101)]
+    textbooks = [
+        Textbook(id=i, author=f'Author {i}', title=f'Title {i}', subject='Physics', isbn=9780000000000 + i)
+        for i in range(1, 501)
+    ]
+    created = datetime(2024, 9, 1, 12, 30, 0)
+    posts = [
+        Post(id=i, user=users[i % 100], user_id=users[i % 100].id, textbook=textbooks[i % 500],
+             textbook_id=textbooks[i % 500].id, price=20 + i % 80, condition='Good', created_at=created,
+             img=f'textbook_covers/cover{i % 50}' if i % 3 else None)
+        for i in range(1, size + 1)
+    ]
+    comments = [
+        Comment(id=i, user=users[i % 100], user_id=users[i % 100].id, post=posts[i % size],
+                post_id=posts[i % size].id, text=f'Comment {i}', created_at=created)
+        for i in range(1, size + 1)
+    ]
+    return {'User': users, 'Textbook': textbooks, 'Post': posts, 'Comment': comments}
+
+
+def timed(serialize, objects, size):
+    # Cycle through the pool so every model is measured over ``size`` calls.
+    start = time.perf_counter()
+    for index in range(size):
+        serialize(objects[index % len(objects)])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    args = parser.parse_args()
+
+    print(f"{'model':10} {'rows':>8} {'mixin s':>10} {'compiled s':>11} {'speedup':>8}")
+    for size in args.sizes:
+        for name, objects in build(size).items():
+            model = type(objects[0])
+            fast = model._compiled_serializer
+            for obj in objects[:50]:
+                assert json.dumps(fast(obj)) == json.dumps(SerializerMixin.to_dict(obj)), f"{name} output differs"
+            slow_time = timed(SerializerMixin.to_dict, objects, size)
+            fast_time = timed(fast, objects, size)
+            print(f"{name:10} {size:>8} {slow_time:>10.3f} {fast_time:>11.3f} {slow_time / fast_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import joinedload
+from config import db
+from models import Post, Textbook, User
+
+REQUIRED_FIELDS = ('user_id', 'isbn', 'price', 'condition')
+
+
+def validate_listing(item):
+    """Return ``(listing, None)`` for a well-formed item or ``(None, message)``."""
+    if not isinstance(item, dict):
+        return None, "Each listing must be an object"
+    if any(not item.get(field) for field in REQUIRED_FIELDS):
+        return None, "User ID, ISBN, price, and condition are required"
+    try:
+        user_id = int(item['user_id'])
+    except (TypeError, ValueError):
+        return None, "User ID must be an integer."
+    try:
+        isbn = int(item['isbn'])
+    except (TypeError, ValueError):
+        return None, "ISBN must be an integer."
+    try:
+        Textbook.validate_isbn(isbn)
+    except ValueError as e:
+        return None, str(e)
+    try:
+        float(item['price'])
+    except (TypeError, ValueError):
+        return None, "Price must be a number."
+
+    return {
+        'user_id': user_id,
+        'isbn': isbn,
+        'price': item['price'],
+        'condition': item['condition'],
+        'img': item.get('image_public_id') or None,
+        'title': item.get('title', ''),
+        'author': item.get('author', ''),
+        'subject': item.get('subject', ''),
+    }, None
+
+
+def _insert(table):
+    if db.engine.dialect.name == 'postgresql':
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+def upsert_textbooks(listings):
+    """Map each listing's ISBN to a textbook id, creating missing textbooks.
+
+    Every ISBN is looked up in one ``IN`` query. Unknown ones are then
+    inserted in a single ``INSERT ... ON CONFLICT DO NOTHING`` (details taken
+    from the first listing that names the ISBN) and their ids read back with
+    one more ``IN`` query.
+    Existing textbooks are left untouched, as with ``POST /posts``.
+    """
+    rows = {}
+    for listing in listings:
+        rows.setdefault(listing['isbn'], {
+            'isbn': listing['isbn'],
+            'title': listing['title'],
+            'author': listing['author'],
+            'subject': listing['subject'],
+        })
+
+    textbook_ids = dict(db.session.execute(
+        select(Textbook.isbn, Textbook.id).where(Textbook.isbn.in_(list(rows)))
+    ).all())
+    missing = [row for isbn, row in rows.items() if isbn not in textbook_ids]
+    if missing:
+        statement = _insert(Textbook.__table__).on_conflict_do_nothing(index_elements=['isbn'])
+        db.session.execute(statement, missing)
+        # Not cached until the caller commits.
+        textbook_ids.update(db.session.execute(
+            select(Textbook.isbn, Textbook.id).where(Textbook.isbn.in_([row['isbn'] for row in missing]))
+        ).all())
+    return textbook_ids
+
+
+def create_posts(items):
+    """Create a batch of listings in one transaction.
+
+    Returns ``(results, created)`` where ``results`` holds one entry per
+    input item, in order: ``{'index', 'status', 'post'}`` for created
+    listings and ``{'index', 'status', 'message'}`` for rejected ones.
+    Items are validated up front; a database error rolls back the whole
+    batch and is raised to the caller.
+    """
+    results = [None] * len(items)
+    pending = []
+    for index, item in enumerate(items):
+        listing, error = validate_listing(item)
+        if error:
+            results[index] = {'index': index, 'status': 400, 'message': error}
+        else:
+            pending.append((index, listing))
+
+    user_ids = {listing['user_id'] for _, listing in pending}
+    known_users = set()
+    if user_ids:
+        known_users = set(db.session.execute(select(User.id).where(User.id.in_(user_ids))).scalars())
+
+    valid = []
+    for index, listing in pending:
+        if listing['user_id'] in known_users:
+            valid.append((index, listing))
+        else:
+            results[index] = {'index': index, 'status': 404, 'message': "User not found"}
+
+    if not valid:
+        return results, 0
+
+    textbook_ids = upsert_textbooks([listing for _, listing in valid])
+    posts = [
+        Post(
+            user_id=listing['user_id'],
+            textbook_id=textbook_ids[listing['isbn']],
+            price=listing['price'],
+            condition=listing['condition'],
+            img=listing['img'],
+        )
+        for _, listing in valid
+    ]
+    db.session.add_all(posts)
+    db.session.flush()
+    post_ids = [post.id for post in posts]
+    db.session.commit()
+
+    # Read the new rows back in one query rather than letting each expired
+    # instance refresh itself (and lazy-load its user and textbook).
+    created = {
+        post.id: post
+        for post in Post.query.options(joinedload(Post.user), joinedload(Post.textbook))
+        .filter(Post.id.in_(post_ids))
+    }
+    for (index, _), post_id in zip(valid, post_ids):
+        post = created[post_id]
+        post_data = post.to_dict()
+        post_data['textbook'] = post.textbook.to_dict()
+        post_data['user'] = post.user.to_dict()
+        results[index] = {'index': index, 'status': 201, 'post': post_data}
+    return results, len(valid)
@@ -12,15 +12,73 @@ from sqlalchemy import MetaData
 from flask_uploads import UploadSet, IMAGES, configure_uploads
 from flask_mail import Mail
 import cloudinary
+from database import engine_options, install_sqlite_pragmas
 
 # Instantiate app, set attributes
 app = Flask(__name__)
 
 # Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///app.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Pool sizing for PostgreSQL; SQLite gets its pragmas once the engine exists
+# (see database.py). DB_ENGINE_PROFILE=default turns both off.
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 app.json.compact = False
 
+# Collection endpoints return the full, unpaginated array unless the client
+# asks for a page with ?limit= or ?cursor=. Set to 0 to paginate by default.
+app.config['LEGACY_UNPAGINATED_LISTINGS'] = os.environ.get('LEGACY_UNPAGINATED_LISTINGS', '1') == '1'
+
+# In-process cache of rendered GET responses (see response_cache.py). The TTL
+# bounds staleness across workers, since invalidation is per process.
+app.config['RESPONSE_CACHE_ENABLED'] = os.environ.get('RESPONSE_CACHE_ENABLED', '1') == '1'
+app.config['RESPONSE_CACHE_MAX_ENTRIES'] = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 512))
+app.config['RESPONSE_CACHE_MAX_BYTES'] = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+app.config['RESPONSE_CACHE_TTL'] = int(os.environ.get('RESPONSE_CACHE_TTL', 30))
+
+# Most listings accepted by one POST /posts/bulk request.
+app.config['BULK_POSTS_MAX_ITEMS'] = int(os.environ.get('BULK_POSTS_MAX_ITEMS', 500))
+
+# Per-process cache behind Flask-Login's user_loader (see identity_cache.py).
+# The TTL bounds how long another worker may see a deleted/changed user; 0
+# turns the cache off.
+app.config['IDENTITY_CACHE_TTL'] = float(os.environ.get('IDENTITY_CACHE_TTL', 30))
+app.config['IDENTITY_CACHE_MAX_ENTRIES'] = int(os.environ.get('IDENTITY_CACHE_MAX_ENTRIES', 10000))
+
+# Log any SQL statement slower than this many milliseconds, with the endpoint
+# that issued it (see metrics.py). 0 turns the slow-query log off.
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 0))
+
+# Logs are written as JSON lines by a background thread (see logs.py).
+# LOG_SAMPLE_RATES keeps a fraction of each level, e.g. "DEBUG=0.01,INFO=0.5".
+app.config['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'INFO').upper()
+app.config['LOG_SAMPLE_RATES'] = os.environ.get('LOG_SAMPLE_RATES', '')
+
+# WRITE_COALESCING=1 sends comment, watchlist and post inserts through one
+# writer thread that commits them in groups (see write_queue.py).
+# Experimental: it has shown no write-throughput gain on SQLite so far.
+app.config['WRITE_COALESCING'] = os.environ.get('WRITE_COALESCING', '0') == '1'
+app.config['WRITE_COALESCE_INTERVAL_MS'] = float(os.environ.get('WRITE_COALESCE_INTERVAL_MS', 5))
+app.config['WRITE_COALESCE_MAX_BATCH'] = int(os.environ.get('WRITE_COALESCE_MAX_BATCH', 200))
+app.config['WRITE_COALESCE_TIMEOUT'] = 10  # seconds a request waits for its row
+
+# bcrypt runs in a process pool (see passwords.py). Hashes made with a
+# different BCRYPT_LOG_ROUNDS are upgraded on the user's next login.
+# PASSWORD_HASH_WORKERS=0 hashes on the request thread instead.
+app.config['BCRYPT_LOG_ROUNDS'] = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 32))
+app.config['PASSWORD_HASH_TIMEOUT'] = 10  # seconds
+
+# Server-sent events at /users/<id>/events (see events.py). Each open stream
+# holds a server thread, so EVENTS_MAX_CONNECTIONS caps them per worker.
+app.config['EVENTS_MAX_CONNECTIONS'] = int(os.environ.get('EVENTS_MAX_CONNECTIONS', 100))
+app.config['EVENTS_HEARTBEAT_SECONDS'] = float(os.environ.get('EVENTS_HEARTBEAT_SECONDS', 15))
+app.config['EVENTS_REPLAY_SIZE'] = 100  # recent events kept per user for Last-Event-ID resume
+app.config['EVENTS_REPLAY_USERS'] = 1000  # users with kept events; least recently notified dropped first
+app.config['EVENTS_QUEUE_SIZE'] = 100  # undelivered events before a slow stream is dropped
+app.config['EVENTS_RETRY_MS'] = 3000  # reconnect delay sent to EventSource clients
+
 # Configure Flask-Uploads
 app.config['UPLOADED_IMAGES_DEST'] = 'uploads/images'
 ALLOWED_IMAGE_EXTENSIONS = ['png', 'jpg', 'jpeg', 'gif']
@@ -47,17 +105,43 @@ CORS(app)
 # Initialize Flask-Migrate after SQLAlchemy
 migrate = Migrate(app, db)
 db.init_app(app)
+with app.app_context():
+    install_sqlite_pragmas(db.engine)
 
 # Configure Flask-Mail
+# MAIL_SERVER/MAIL_PORT/MAIL_USE_SSL can point at a local stand-in, e.g.
+#   python -m aiosmtpd -n -l localhost:1025
+#   MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_USE_SSL=0 flask run
 app.config.update(
-    MAIL_SERVER="smtp.gmail.com",
-    MAIL_PORT=465,
+    MAIL_SERVER=os.environ.get('MAIL_SERVER', "smtp.gmail.com"),
+    MAIL_PORT=int(os.environ.get('MAIL_PORT', 465)),
     MAIL_USE_TLS=False,
-    MAIL_USE_SSL=True,
-    MAIL_USERNAME='campustextbookexchange@gmail.com',
-    MAIL_PASSWORD='bkrb couo vrqn gdsq',  
+    MAIL_USE_SSL=os.environ.get('MAIL_USE_SSL', '1') == '1',
+    MAIL_USERNAME=os.environ.get('MAIL_USERNAME', 'campustextbookexchange@gmail.com'),
+    MAIL_PASSWORD=os.environ.get('MAIL_PASSWORD', 'bkrb couo vrqn gdsq'),
     MAIL_DEFAULT_SENDER='campustextbookexchange@gmail.com'
 )
+
+# Outbox dispatcher (see mailer.py)
+app.config.update(
+    MAIL_BATCH_SIZE=int(os.environ.get('MAIL_BATCH_SIZE', 50)),  # messages per SMTP session
+    MAIL_MAX_IN_FLIGHT=int(os.environ.get('MAIL_MAX_IN_FLIGHT', 200)),  # claimed-but-unsent cap, across workers
+    MAIL_MAX_ATTEMPTS=5,
+    MAIL_RETRY_BACKOFF=30,  # seconds, doubled per attempt
+    MAIL_RETRY_BACKOFF_MAX=3600,
+    MAIL_CLAIM_LEASE=300,  # seconds before a stuck 'sending' row is retried
+    MAIL_POLL_INTERVAL=5,
+    # Run the dispatcher thread in this process; it starts with the app so
+    # mail left over from before a restart goes out without waiting for the
+    # next enqueue. 0 leaves the outbox to `flask drain-outbox`.
+    OUTBOX_DISPATCHER=os.environ.get('OUTBOX_DISPATCHER', '1') == '1',
+    # Price drops for the same recipient within this many seconds are sent
+    # as one digest email. 0 sends each drop on the next dispatcher pass.
+    MAIL_DIGEST_WINDOW=int(os.environ.get('MAIL_DIGEST_WINDOW', 120)),
+    # /metrics reuses the outbox's by-status counts for this many seconds,
+    # so scraping doesn't GROUP BY the whole outbox table every time.
+    OUTBOX_METRICS_TTL=float(os.environ.get('OUTBOX_METRICS_TTL', 30)),
+)
 mail = Mail(app)
 
 # Secret key configuration
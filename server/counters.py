@@ -0,0 +1,69 @@
+from sqlalchemy import and_, func, select, update
+from config import app, db
+from models import Comment, Notification, Post, User, Watchlist
+
+
+def adjust_post_counts(post_id, comments=0, watchers=0):
+    """Add ``comments``/``watchers`` to a post's counters in the current transaction."""
+    values = {}
+    if comments:
+        values['comment_count'] = Post.comment_count + comments
+    if watchers:
+        values['watcher_count'] = Post.watcher_count + watchers
+    if values:
+        db.session.execute(
+            update(Post).where(Post.id == post_id).values(**values).execution_options(synchronize_session=False)
+        )
+
+
+def comment_added(comment):
+    adjust_post_counts(comment.post_id, comments=1)
+
+
+def watchlist_added(entry):
+    adjust_post_counts(entry.post_id, watchers=1)
+
+
+def forget_user_activity(user_id):
+    """Take a user's comments and watchlist entries off the counters of the
+    posts they were on, ahead of the cascade that deletes them."""
+    for model, counter in ((Comment, 'comments'), (Watchlist, 'watchers')):
+        rows = db.session.execute(
+            select(model.post_id, func.count()).where(model.user_id == user_id).group_by(model.post_id)
+        ).all()
+        for post_id, count in rows:
+            adjust_post_counts(post_id, **{counter: -count})
+
+
+def repair_counts():
+    """Recompute every denormalized counter from its base table.
+
+    Only rows whose stored value is wrong are written. Returns the number
+    of rows fixed per counter; the caller commits.
+    """
+    comments = select(func.count(Comment.id)).where(Comment.post_id == Post.id).scalar_subquery()
+    watchers = select(func.count(Watchlist.id)).where(Watchlist.post_id == Post.id).scalar_subquery()
+    unread = (
+        select(func.count(Notification.id))
+        .where(and_(Notification.user_id == User.id, Notification.read.is_(False)))
+        .scalar_subquery()
+    )
+    fixes = (
+        ('posts.comment_count', update(Post).where(Post.comment_count != comments).values(comment_count=comments)),
+        ('posts.watcher_count', update(Post).where(Post.watcher_count != watchers).values(watcher_count=watchers)),
+        ('users.unread_notifications',
+         update(User).where(User.unread_notifications != unread).values(unread_notifications=unread)),
+    )
+    return {
+        name: db.session.execute(statement.execution_options(synchronize_session=False)).rowcount
+        for name, statement in fixes
+    }
+
+
+@app.cli.command('repair-counts')
+def repair_counts_command():
+    """Recompute comment, watcher and unread-notification counters."""
+    fixed = repair_counts()
+    db.session.commit()
+    for name, rows in fixed.items():
+        print(f"{name}: {rows} row(s) fixed")
@@ -0,0 +1,66 @@
+import os
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# DB_ENGINE_PROFILE=tuned (the default) applies the settings below;
+# DB_ENGINE_PROFILE=default leaves SQLAlchemy's stock engine options alone.
+ENGINE_PROFILES = ('tuned', 'default')
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def sqlite_pragmas():
+    return {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000),
+        'mmap_size': _env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+        # Negative values are KiB, so this is a 64 MiB page cache.
+        'cache_size': _env_int('SQLITE_CACHE_SIZE', -64 * 1024),
+        'temp_store': 'MEMORY',
+    }
+
+
+def postgresql_pool_options():
+    return {
+        'pool_size': _env_int('DB_POOL_SIZE', 10),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 20),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+        # Recycle before common server/proxy idle timeouts cut the socket.
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': True,
+    }
+
+
+def engine_profile():
+    profile = os.environ.get('DB_ENGINE_PROFILE', 'tuned')
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(f"DB_ENGINE_PROFILE must be one of {', '.join(ENGINE_PROFILES)}, got {profile!r}")
+    return profile
+
+
+def engine_options(url):
+    """SQLALCHEMY_ENGINE_OPTIONS for ``url`` under the active profile."""
+    if engine_profile() == 'default':
+        return {}
+    if make_url(url).get_backend_name() == 'postgresql':
+        return postgresql_pool_options()
+    return {}
+
+
+def install_sqlite_pragmas(engine):
+    """Apply sqlite_pragmas() to every new connection of a SQLite engine."""
+    if engine_profile() == 'default' or engine.dialect.name != 'sqlite':
+        return
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
@@ -0,0 +1,140 @@
+import itertools
+import json
+import queue
+import threading
+from collections import OrderedDict, deque
+from flask import Response
+from config import app
+
+SSE_MIMETYPE = 'text/event-stream'
+
+
+class TooManySubscribers(Exception):
+    """Raised when EVENTS_MAX_CONNECTIONS streams are already open in this worker."""
+
+
+class Subscription:
+    def __init__(self, bus, user_id):
+        self.bus = bus
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=bus.app.config['EVENTS_QUEUE_SIZE'])
+        self.overflowed = False
+
+    def deliver(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # The client isn't keeping up; its stream ends and it reconnects
+            # with Last-Event-ID, picking the backlog up from the replay log.
+            self.overflowed = True
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """In-process pub/sub of per-user events for the SSE stream.
+
+    Each user keeps the last EVENTS_REPLAY_SIZE events so a reconnecting
+    client can resume from its Last-Event-ID. Only the EVENTS_REPLAY_USERS
+    most recently notified users are kept; a client whose history was
+    dropped resumes from live events. Event ids come from a
+    per-process counter, so resume only spans reconnects to the same
+    worker; a client that lands elsewhere just starts from live events.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._subscribers = {}
+        self._history = OrderedDict()
+        self.connections = 0
+        self.published = 0
+        self.rejected = 0
+
+    def publish(self, user_ids, event_type, data):
+        replay_size = self.app.config['EVENTS_REPLAY_SIZE']
+        with self._lock:
+            for user_id in set(user_ids):
+                event = (next(self._ids), event_type, data)
+                history = self._history.get(user_id)
+                if history is None:
+                    history = self._history[user_id] = deque(maxlen=replay_size)
+                else:
+                    self._history.move_to_end(user_id)
+                history.append(event)
+                for subscription in self._subscribers.get(user_id, ()):
+                    subscription.deliver(event)
+                self.published += 1
+            while len(self._history) > self.app.config['EVENTS_REPLAY_USERS']:
+                self._history.popitem(last=False)
+
+    def subscribe(self, user_id, last_event_id=None):
+        """Register a stream for ``user_id`` and return it with any events it missed."""
+        with self._lock:
+            if self.connections >= self.app.config['EVENTS_MAX_CONNECTIONS']:
+                self.rejected += 1
+                raise TooManySubscribers("Too many open event streams")
+            subscription = Subscription(self, user_id)
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+            self.connections += 1
+            missed = []
+            if last_event_id is not None:
+                missed = [event for event in self._history.get(user_id, ()) if event[0] > last_event_id]
+        return subscription, missed
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers and subscription in subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+                self.connections -= 1
+
+
+event_bus = EventBus(app)
+
+
+def format_event(event):
+    event_id, event_type, data = event
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+def parse_last_event_id(value):
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def stream_events(user_id, last_event_id=None):
+    """SSE response for ``user_id``: missed events, then live ones, with heartbeats.
+
+    The generator runs after the request's app context is gone and never
+    touches the database, so an open stream doesn't hold a connection.
+    """
+    subscription, missed = event_bus.subscribe(user_id, last_event_id)
+    heartbeat = app.config['EVENTS_HEARTBEAT_SECONDS']
+
+    def generate():
+        try:
+            yield f"retry: {app.config['EVENTS_RETRY_MS']}\n\n"
+            for event in missed:
+                yield format_event(event)
+            while not subscription.overflowed:
+                try:
+                    event = subscription.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield format_event(event)
+        finally:
+            subscription.close()
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    response = Response(generate(), mimetype=SSE_MIMETYPE, headers=headers)
+    # Also release the slot if the stream is closed before it ever starts.
+    response.call_on_close(subscription.close)
+    return response
@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from config import app, db
+from models import User
+
+
+class IdentityCache:
+    """Bounded, short-TTL LRU of user id -> the user's column values.
+
+    Lets Flask-Login's user_loader rebuild ``current_user`` without a
+    primary-key SELECT on every authenticated request. Only plain column
+    values are stored, never ORM instances, so nothing is shared between
+    sessions or threads. Deleting a user or changing their row must call
+    :meth:`discard`; the TTL bounds how long another worker process can
+    keep serving a stale copy.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, user_id, values):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, values)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, *user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+identity_cache = IdentityCache(
+    max_entries=app.config['IDENTITY_CACHE_MAX_ENTRIES'],
+    ttl=app.config['IDENTITY_CACHE_TTL'],
+)
+
+_USER_COLUMNS = [attr.key for attr in inspect(User).column_attrs]
+
+
+def load_cached_user(user_id):
+    """Return the User with ``user_id`` attached to the current session, or None.
+
+    On a cache hit the instance is rebuilt from the cached values and merged
+    with ``load=False``, which puts it in the session without a query.
+    """
+    values = identity_cache.get(user_id)
+    if values is None:
+        user = db.session.get(User, user_id)
+        if user is not None:
+            identity_cache.set(user_id, {key: getattr(user, key) for key in _USER_COLUMNS})
+        return user
+
+    user = User.__mapper__.class_manager.new_instance()
+    for key, value in values.items():
+        set_committed_value(user, key, value)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
@@ -0,0 +1,30 @@
+from functools import lru_cache
+from cloudinary.utils import cloudinary_url
+
+IMAGE_URL_CACHE_SIZE = 8192
+
+# Transformations are stored as sorted tuples so they can be cache keys.
+IMAGE_VARIANTS = {
+    'thumbnail': (('crop', 'fill'), ('fetch_format', 'auto'), ('height', 200), ('quality', 'auto'), ('width', 150)),
+    'medium': (('crop', 'limit'), ('fetch_format', 'auto'), ('quality', 'auto'), ('width', 600)),
+    'full': (),
+}
+
+
+@lru_cache(maxsize=IMAGE_URL_CACHE_SIZE)
+def _build_url(public_id, transformation):
+    return cloudinary_url(public_id, **dict(transformation))[0]  # cloudinary_url returns a tuple (url, options)
+
+
+def image_url(public_id, transformation=()):
+    """Delivery URL for a Cloudinary public ID, memoized per transformation.
+
+    Cloudinary settings are read once at startup, so the URL for a given
+    (public_id, transformation) never changes while the process runs; call
+    ``_build_url.cache_clear()`` if ``cloudinary.config`` is changed later.
+    """
+    return _build_url(public_id, transformation)
+
+
+def image_variants(public_id):
+    return {name: image_url(public_id, transformation) for name, transformation in IMAGE_VARIANTS.items()}
@@ -0,0 +1,150 @@
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import joinedload, selectinload
+from config import db
+from models import Post, Comment, Textbook, User, Watchlist
+
+
+MAX_EMBED_COMMENTS = 50
+
+
+def parse_embed_comments(value):
+    """``?embed_comments=N``: embed only the latest N comments per post.
+
+    None (the parameter is absent) keeps the full comment list.
+    """
+    if value is None:
+        return None
+    try:
+        count = int(value)
+    except ValueError:
+        raise ValueError("embed_comments must be an integer.")
+    if count < 0:
+        raise ValueError("embed_comments must be at least 0.")
+    return min(count, MAX_EMBED_COMMENTS)
+
+
+def post_loader_options(embed_comments=None):
+    # Many-to-one rows ride along on the posts SELECT, comments (and their
+    # authors) come back in a single IN query, so a listing costs two
+    # statements however many posts it contains. With embed_comments the
+    # comments are left to latest_comments() instead.
+    options = [joinedload(Post.user), joinedload(Post.textbook)]
+    if embed_comments is None:
+        options.append(selectinload(Post.comments).joinedload(Comment.user))
+    return options
+
+
+def listing_query(embed_comments=None):
+    return Post.query.options(*post_loader_options(embed_comments))
+
+
+def latest_comments(post_ids, limit):
+    """The newest ``limit`` comments of each post, as ``{post_id: [comment, ...]}``.
+
+    One statement for the whole page: ROW_NUMBER() ranks each post's
+    comments newest first and only the top ``limit`` are fetched. Each
+    list is returned oldest first, like the full comment list.
+    """
+    latest = {post_id: [] for post_id in post_ids}
+    if not post_ids or not limit:
+        return latest
+    ranked = (
+        select(
+            Comment.id,
+            func.row_number().over(partition_by=Comment.post_id, order_by=Comment.id.desc()).label('rank'),
+        )
+        .where(Comment.post_id.in_(post_ids))
+        .subquery()
+    )
+    comments = (
+        Comment.query.options(joinedload(Comment.user))
+        .join(ranked, ranked.c.id == Comment.id)
+        .filter(ranked.c.rank <= limit)
+        .order_by(Comment.post_id, Comment.id)
+    )
+    for comment in comments:
+        latest[comment.post_id].append(comment)
+    return latest
+
+
+def serialize_post(post, comments=None):
+    post_data = post.to_dict()
+    post_data['user'] = post.user.to_dict()
+    post_data['textbook'] = post.textbook.to_dict()
+    if comments is None:
+        comments = post.comments
+    post_data['comments'] = [comment.to_dict() for comment in comments]
+    return post_data
+
+
+def serialize_posts(posts, embed_comments=None):
+    if embed_comments is None:
+        return [serialize_post(post) for post in posts]
+    latest = latest_comments([post.id for post in posts], embed_comments)
+    return [serialize_post(post, latest[post.id]) for post in posts]
+
+
+def posts_query(user_id=None, embed_comments=None):
+    query = listing_query(embed_comments)
+    if user_id:
+        query = query.filter_by(user_id=user_id)
+    return query
+
+
+def list_posts(user_id=None, embed_comments=None):
+    return serialize_posts(posts_query(user_id, embed_comments).all(), embed_comments)
+
+
+def get_post(post_id, embed_comments=None):
+    post = listing_query(embed_comments).filter_by(id=post_id).first()
+    if post is None:
+        return None
+    return serialize_posts([post], embed_comments)[0]
+
+
+def serialize_watchlist_post(post, textbook):
+    post_data = post.to_dict()
+    post_data['textbook'] = {
+        'id': textbook.id,
+        'title': textbook.title,
+        'author': textbook.author,
+        'isbn': textbook.isbn
+    }
+    return post_data
+
+
+def watchlist_entries(user_id, since=None, limit=None):
+    """Return ``(watchlist_id, post, textbook)`` rows for a user's watchlist.
+
+    Everything comes back in one SELECT: the user row is the outer side of
+    the join so a missing user (``None``) can be told apart from an empty
+    watchlist (``[]``) without a separate lookup. Entries whose post or
+    textbook is gone are left out of the join itself, before the LIMIT, so
+    they never shorten a page.
+    """
+    live = (
+        select(Post.id)
+        .join(Textbook, Textbook.id == Post.textbook_id)
+        .where(Post.id == Watchlist.post_id)
+        .exists()
+    )
+    watchlist_join = and_(Watchlist.user_id == User.id, live)
+    if since is not None:
+        watchlist_join = and_(watchlist_join, Watchlist.id > since)
+
+    query = (
+        db.session.query(User.id, Watchlist.id, Post, Textbook)
+        .select_from(User)
+        .outerjoin(Watchlist, watchlist_join)
+        .outerjoin(Post, Post.id == Watchlist.post_id)
+        .outerjoin(Textbook, Textbook.id == Post.textbook_id)
+        .filter(User.id == user_id)
+        .order_by(Watchlist.id)
+    )
+    if limit is not None:
+        query = query.limit(limit)
+
+    rows = query.all()
+    if not rows:
+        return None
+    return [(watchlist_id, post, textbook) for _, watchlist_id, post, textbook in rows if watchlist_id is not None]
@@ -0,0 +1,124 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, has_request_context, request
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+_VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+# Attributes every LogRecord has; anything else on a record came in through
+# ``extra=`` and is emitted as its own JSON field.
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Tag records logged while serving a request with its id, method and path."""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.method = request.method
+            record.path = request.path
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of the records at each level, e.g. {'DEBUG': 0.01}."""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        rate = self.rates.get(record.levelname, 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Resolve the message and traceback here, in the logging thread, but
+        # leave JSON formatting to the listener.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def parse_sample_rates(value):
+    """Parse ``"DEBUG=0.01,INFO=0.5"`` into ``{'DEBUG': 0.01, 'INFO': 0.5}``."""
+    rates = {}
+    for part in filter(None, (item.strip() for item in (value or '').split(','))):
+        level, _, rate = part.partition('=')
+        try:
+            rates[level.strip().upper()] = float(rate)
+        except ValueError:
+            raise ValueError(f"Invalid LOG_SAMPLE_RATES entry: {part!r}")
+    return rates
+
+
+def configure_logging(app, stream=None):
+    """Send every log record through a queue to a background JSON writer.
+
+    Request handlers only pay for putting a record on an in-memory queue;
+    formatting and the write to ``stream`` (stdout by default) happen on
+    the QueueListener's thread.
+    """
+    log_queue = queue.SimpleQueue()
+    handler = _QueueHandler(log_queue)
+    handler.addFilter(RequestContextFilter())
+    handler.addFilter(SamplingFilter(parse_sample_rates(app.config['LOG_SAMPLE_RATES'])))
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+    listener = QueueListener(log_queue, output)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(app.config['LOG_LEVEL'])
+
+    listener.start()
+    atexit.register(listener.stop)
+
+    @app.before_request
+    def assign_request_id():
+        incoming = request.headers.get(REQUEST_ID_HEADER, '')
+        g.request_id = incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex
+
+    @app.after_request
+    def send_request_id(response):
+        if 'request_id' in g:
+            response.headers[REQUEST_ID_HEADER] = g.request_id
+        return response
+
+    return listener
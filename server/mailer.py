@@ -0,0 +1,274 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from flask_mail import Message
+from sqlalchemy import and_, or_, func
+from config import app, db, mail
+from models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+
+def render_price_drop(items):
+    if len(items) == 1:
+        item = items[0]
+        subject = f"Price Drop Alert: {item['title']}"
+        body = f"The price of {item['title']} has dropped to ${item['price']}. Check it out now!"
+        return subject, body
+    subject = f"Price Drop Alert: {len(items)} textbooks on your watchlist"
+    lines = [f"- {item['title']} is now ${item['price']}" for item in items]
+    body = "Prices have dropped on textbooks you are watching:\n\n" + "\n".join(lines) + "\n\nCheck them out now!"
+    return subject, body
+
+
+DIGEST_RENDERERS = {
+    'price_drop': render_price_drop,
+}
+
+digest_stats = Counter()
+_digest_stats_lock = threading.Lock()
+
+
+def _count(name):
+    with _digest_stats_lock:
+        digest_stats[name] += 1
+
+
+def enqueue_digest_items(recipients, digest_key, item_key, item):
+    """Fold ``item`` into each recipient's pending digest, or start one.
+
+    A new digest is held back for MAIL_DIGEST_WINDOW seconds; anything else
+    queued for the same recipient and ``digest_key`` before it is claimed is
+    merged into the same message. Re-sending ``item_key`` (e.g. the same post
+    dropping twice) replaces the earlier entry instead of adding a line.
+    """
+    render = DIGEST_RENDERERS[digest_key]
+    pending = {}
+    if recipients:
+        rows = OutboundEmail.query.filter(
+            OutboundEmail.recipient.in_(recipients),
+            OutboundEmail.digest_key == digest_key,
+            OutboundEmail.status == 'pending',
+            OutboundEmail.attempts == 0,
+        ).order_by(OutboundEmail.id).all()
+        pending = {row.recipient: row for row in rows}
+
+    window = app.config['MAIL_DIGEST_WINDOW']
+    for recipient in recipients:
+        digest = pending.get(recipient)
+        if digest is not None:
+            items = json.loads(digest.digest_items)
+            items[str(item_key)] = item
+            subject, body = render(list(items.values()))
+            # Guard on status so a row the dispatcher claimed in the meantime
+            # is left alone and the item goes into a fresh digest instead.
+            merged = OutboundEmail.query.filter_by(id=digest.id, status='pending').update(
+                {'digest_items': json.dumps(items), 'subject': subject, 'body': body},
+                synchronize_session=False,
+            )
+            if merged:
+                _count('merged')
+                continue
+
+        items = {str(item_key): item}
+        subject, body = render(list(items.values()))
+        db.session.add(OutboundEmail(
+            recipient=recipient,
+            subject=subject,
+            body=body,
+            status='pending',
+            attempts=0,
+            next_attempt_at=datetime.utcnow() + timedelta(seconds=window),
+            digest_key=digest_key,
+            digest_items=json.dumps(items),
+        ))
+        _count('created')
+
+
+_status_counts = None  # (monotonic time counted, {status: count})
+_status_counts_lock = threading.Lock()
+
+
+def outbox_status_counts(max_age):
+    """Outbound emails per status, counted at most ``max_age`` seconds ago.
+
+    Rows change status in every worker and in `flask drain-outbox`, so no
+    process can keep these as running counters; the count is taken from
+    the table and reused until it is ``max_age`` old.
+    """
+    global _status_counts
+    with _status_counts_lock:
+        if _status_counts is not None and time.monotonic() - _status_counts[0] < max_age:
+            return dict(_status_counts[1])
+        counts = dict(
+            db.session.query(OutboundEmail.status, func.count(OutboundEmail.id))
+            .group_by(OutboundEmail.status)
+            .all()
+        )
+        _status_counts = (time.monotonic(), counts)
+        return dict(counts)
+
+
+def outbox_metrics(max_age=None):
+    """Outbox gauges for /metrics; by-status counts may be OUTBOX_METRICS_TTL old."""
+    if max_age is None:
+        max_age = app.config['OUTBOX_METRICS_TTL']
+    status_counts = outbox_status_counts(max_age)
+    with _digest_stats_lock:
+        stats = dict(digest_stats)
+    return {
+        'digest_window_seconds': app.config['MAIL_DIGEST_WINDOW'],
+        'digests_created': stats.get('created', 0),
+        'digest_items_merged': stats.get('merged', 0),
+        'outbox_by_status': status_counts,
+    }
+
+
+def retry_delay(attempts):
+    base = app.config['MAIL_RETRY_BACKOFF']
+    return min(base * 2 ** (attempts - 1), app.config['MAIL_RETRY_BACKOFF_MAX'])
+
+
+class OutboxDispatcher:
+    """Drains ``outbound_emails`` in batches over one SMTP connection."""
+
+    def __init__(self, app):
+        self.app = app
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def wake(self):
+        if self.app.config['OUTBOX_DISPATCHER']:
+            self.start()
+            self._wakeup.set()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='outbox-dispatcher', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            processed = 0
+            with self.app.app_context():
+                try:
+                    processed = self.drain_once()
+                except Exception:
+                    logger.exception("Outbox dispatch failed")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+            if not processed:
+                self._wakeup.wait(self.app.config['MAIL_POLL_INTERVAL'])
+                self._wakeup.clear()
+
+    def _claim(self, now):
+        config = self.app.config
+        lease_cutoff = now - timedelta(seconds=config['MAIL_CLAIM_LEASE'])
+        in_flight = OutboundEmail.query.filter(
+            OutboundEmail.status == 'sending',
+            OutboundEmail.claimed_at >= lease_cutoff,
+        ).count()
+        room = min(config['MAIL_BATCH_SIZE'], config['MAIL_MAX_IN_FLIGHT'] - in_flight)
+        if room <= 0:
+            return []
+
+        # A 'sending' row whose lease ran out belongs to a worker that died
+        # mid-batch, so it is claimable again.
+        claimable = or_(
+            and_(OutboundEmail.status == 'pending', OutboundEmail.next_attempt_at <= now),
+            and_(OutboundEmail.status == 'sending', OutboundEmail.claimed_at < lease_cutoff),
+        )
+        candidates = (
+            db.session.query(OutboundEmail.id)
+            .filter(claimable)
+            .order_by(OutboundEmail.next_attempt_at, OutboundEmail.id)
+            .limit(room)
+            .scalar_subquery()
+        )
+        token = uuid.uuid4().hex
+        OutboundEmail.query.filter(OutboundEmail.id.in_(candidates), claimable).update(
+            {'status': 'sending', 'claimed_by': token, 'claimed_at': now},
+            synchronize_session=False,
+        )
+        db.session.commit()
+        return OutboundEmail.query.filter_by(claimed_by=token, status='sending').order_by(OutboundEmail.id).all()
+
+    def _fail(self, email, error, now):
+        email.attempts += 1
+        email.last_error = str(error)[:1000]
+        email.claimed_by = None
+        email.claimed_at = None
+        if email.attempts >= self.app.config['MAIL_MAX_ATTEMPTS']:
+            email.status = 'failed'
+            logger.error(f"Giving up on email {email.id} to {email.recipient}: {error}")
+        else:
+            email.status = 'pending'
+            email.next_attempt_at = now + timedelta(seconds=retry_delay(email.attempts))
+
+    def drain_once(self):
+        """Send one claimed batch; returns the number of rows processed."""
+        now = datetime.utcnow()
+        batch = self._claim(now)
+        if not batch:
+            return 0
+
+        try:
+            with mail.connect() as conn:
+                for email in batch:
+                    try:
+                        conn.send(Message(email.subject, recipients=[email.recipient], body=email.body))
+                    except Exception as e:
+                        self._fail(email, e, datetime.utcnow())
+                    else:
+                        email.status = 'sent'
+                        email.sent_at = datetime.utcnow()
+                        email.claimed_by = None
+        except Exception as e:
+            # Connecting (or the final QUIT) failed; anything not yet marked
+            # sent goes back on the queue with backoff.
+            for email in batch:
+                if email.status == 'sending':
+                    self._fail(email, e, datetime.utcnow())
+
+        db.session.commit()
+        return len(batch)
+
+    def drain(self):
+        total = 0
+        while True:
+            processed = self.drain_once()
+            if not processed:
+                return total
+            total += processed
+
+
+outbox = OutboxDispatcher(app)
+
+
+@app.cli.command('drain-outbox')
+def drain_outbox_command():
+    """Send every due email in the outbox, then exit."""
+    sent = outbox.drain()
+    print(f"Processed {sent} outbound emails")
+
+
+@app.cli.command('outbox-stats')
+def outbox_stats_command():
+    """Print outbox depth and the digest coalescing setting."""
+    print(json.dumps(outbox_metrics(max_age=0), indent=2))
@@ -0,0 +1,243 @@
+import logging
+import threading
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from config import app
+from events import event_bus
+from identity_cache import identity_cache
+from mailer import outbox_metrics
+from passwords import password_hasher
+from response_cache import response_cache
+from write_queue import write_queue
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+
+class RequestMetrics:
+    """Per-endpoint request, latency and SQL counters for /metrics.
+
+    Endpoints are labelled with the Flask endpoint name (the lower-cased
+    Resource class for API routes) and the HTTP method, which keeps the
+    label set bounded no matter how many ids show up in URLs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.latency = {}
+        self.statements = {}
+        self.statement_counts = {}
+        self.sql_time = {}
+        self.slow_queries = {}
+
+    def record_request(self, endpoint, method, status, elapsed, statements, sql_time):
+        key = (endpoint, method)
+        with self._lock:
+            self.requests[key + (str(status),)] = self.requests.get(key + (str(status),), 0) + 1
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(elapsed)
+            self.statement_counts.setdefault(key, Histogram(STATEMENT_BUCKETS)).observe(statements)
+            self.sql_time.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(sql_time)
+            self.statements[key] = self.statements.get(key, 0) + statements
+
+    def record_slow_query(self, endpoint, method):
+        key = (endpoint, method)
+        with self._lock:
+            self.slow_queries[key] = self.slow_queries.get(key, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            copy = lambda h: (h.buckets, list(h.counts), h.total, h.count)
+            return {
+                'requests': dict(self.requests),
+                'latency': {key: copy(h) for key, h in self.latency.items()},
+                'statements': dict(self.statements),
+                'statement_counts': {key: copy(h) for key, h in self.statement_counts.items()},
+                'sql_time': {key: copy(h) for key, h in self.sql_time.items()},
+                'slow_queries': dict(self.slow_queries),
+            }
+
+
+request_metrics = RequestMetrics()
+
+
+def _endpoint():
+    return request.endpoint or 'unmatched'
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started'].pop()
+    # Only statements issued while serving a request are attributed; the
+    # outbox dispatcher and CLI commands run without one.
+    if not has_request_context():
+        return
+    elapsed = time.perf_counter() - started
+    g.sql_statements = g.get('sql_statements', 0) + 1
+    g.sql_time = g.get('sql_time', 0.0) + elapsed
+
+    threshold = app.config['SLOW_QUERY_MS']
+    if threshold and elapsed * 1000 >= threshold:
+        request_metrics.record_slow_query(_endpoint(), request.method)
+        logger.warning(
+            "Slow query (%.1f ms) in %s %s [%s]: %s",
+            elapsed * 1000, request.method, request.path, _endpoint(), ' '.join(statement.split()),
+        )
+
+
+@event.listens_for(Engine, 'handle_error')
+def _discard_query_timer(context):
+    started = context.connection.info.get('query_started') if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _record_request(response):
+    endpoint, method, status = _endpoint(), request.method, response.status_code
+    started = g.get('request_started', time.perf_counter())
+    state = g._get_current_object()
+
+    def record():
+        request_metrics.record_request(
+            endpoint, method, status, time.perf_counter() - started,
+            getattr(state, 'sql_statements', 0), getattr(state, 'sql_time', 0.0),
+        )
+
+    # A streamed body runs its queries after this hook, so it is recorded
+    # once the server closes the response instead.
+    if response.is_streamed:
+        response.call_on_close(record)
+    else:
+        record()
+    return response
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels.items()) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Writer:
+    def __init__(self):
+        self.lines = []
+
+    def header(self, name, kind, help_text):
+        self.lines.append(f'# HELP {name} {help_text}')
+        self.lines.append(f'# TYPE {name} {kind}')
+
+    def sample(self, name, value, **labels):
+        self.lines.append(f'{name}{_labels(**labels) if labels else ""} {_format_value(value)}')
+
+    def histogram(self, name, histograms, help_text):
+        self.header(name, 'histogram', help_text)
+        for (endpoint, method), (buckets, counts, total, count) in sorted(histograms.items()):
+            for bound, bucket_count in zip(buckets, counts):
+                self.sample(f'{name}_bucket', bucket_count, endpoint=endpoint, method=method, le=bound)
+            self.sample(f'{name}_bucket', count, endpoint=endpoint, method=method, le='+Inf')
+            self.sample(f'{name}_sum', total, endpoint=endpoint, method=method)
+            self.sample(f'{name}_count', count, endpoint=endpoint, method=method)
+
+
+def render_metrics():
+    """Everything we track, in the Prometheus text exposition format."""
+    snapshot = request_metrics.snapshot()
+    out = _Writer()
+
+    out.header('http_requests_total', 'counter', 'Requests served, by endpoint, method and status.')
+    for (endpoint, method, status), value in sorted(snapshot['requests'].items()):
+        out.sample('http_requests_total', value, endpoint=endpoint, method=method, status=status)
+    out.histogram('http_request_duration_seconds', snapshot['latency'], 'Request latency.')
+
+    out.header('db_statements_total', 'counter', 'SQL statements issued while serving requests.')
+    for (endpoint, method), value in sorted(snapshot['statements'].items()):
+        out.sample('db_statements_total', value, endpoint=endpoint, method=method)
+    out.histogram('db_statements_per_request', snapshot['statement_counts'], 'SQL statements per request.')
+    out.histogram('db_time_per_request_seconds', snapshot['sql_time'], 'Time spent in SQL per request.')
+
+    out.header('db_slow_queries_total', 'counter', 'Statements slower than SLOW_QUERY_MS.')
+    for (endpoint, method), value in sorted(snapshot['slow_queries'].items()):
+        out.sample('db_slow_queries_total', value, endpoint=endpoint, method=method)
+
+    out.header('response_cache_hits_total', 'counter', 'GET responses served from the response cache.')
+    out.sample('response_cache_hits_total', response_cache.hits)
+    out.header('response_cache_misses_total', 'counter', 'GET responses the response cache had to build.')
+    out.sample('response_cache_misses_total', response_cache.misses)
+
+    identity_stats = identity_cache.stats()
+    out.header('identity_cache_hits_total', 'counter', 'Logged-in users loaded from memory.')
+    out.sample('identity_cache_hits_total', identity_stats['hits'])
+    out.header('identity_cache_misses_total', 'counter', 'Logged-in users loaded from the database.')
+    out.sample('identity_cache_misses_total', identity_stats['misses'])
+    out.header('identity_cache_entries', 'gauge', 'Users currently cached.')
+    out.sample('identity_cache_entries', identity_stats['entries'])
+
+    out.header('write_queue_batches_total', 'counter', 'Transactions committed by the group-commit writer.')
+    out.sample('write_queue_batches_total', write_queue.batches)
+    out.header('write_queue_rows_total', 'counter', 'Rows inserted by the group-commit writer.')
+    out.sample('write_queue_rows_total', write_queue.rows)
+
+    out.header('password_hash_completed_total', 'counter', 'bcrypt hashes/checks run by the password pool.')
+    out.sample('password_hash_completed_total', password_hasher.completed)
+    out.header('password_hash_rejected_total', 'counter', 'bcrypt calls refused because PASSWORD_HASH_MAX_PENDING were in flight.')
+    out.sample('password_hash_rejected_total', password_hasher.rejected)
+    out.header('password_hash_timed_out_total', 'counter', 'bcrypt calls abandoned after PASSWORD_HASH_TIMEOUT.')
+    out.sample('password_hash_timed_out_total', password_hasher.timed_out)
+    out.header('password_rehashed_total', 'counter', 'Stored hashes upgraded to BCRYPT_LOG_ROUNDS at login.')
+    out.sample('password_rehashed_total', password_hasher.rehashed)
+
+    out.header('sse_connections', 'gauge', 'Open /users/<id>/events streams.')
+    out.sample('sse_connections', event_bus.connections)
+    out.header('sse_events_published_total', 'counter', 'Events published to users.')
+    out.sample('sse_events_published_total', event_bus.published)
+    out.header('sse_connections_rejected_total', 'counter', 'Streams refused at EVENTS_MAX_CONNECTIONS.')
+    out.sample('sse_connections_rejected_total', event_bus.rejected)
+
+    outbox = outbox_metrics()
+    out.header('outbox_emails', 'gauge', 'Outbound emails by status.')
+    for status, value in sorted(outbox['outbox_by_status'].items()):
+        out.sample('outbox_emails', value, status=status)
+    out.header('outbox_digest_window_seconds', 'gauge', 'MAIL_DIGEST_WINDOW: how long a new digest waits for more items.')
+    out.sample('outbox_digest_window_seconds', outbox['digest_window_seconds'])
+    out.header('outbox_digests_created_total', 'counter', 'Digest emails started.')
+    out.sample('outbox_digests_created_total', outbox['digests_created'])
+    out.header('outbox_digest_items_merged_total', 'counter', 'Items folded into a pending digest.')
+    out.sample('outbox_digest_items_merged_total', outbox['digest_items_merged'])
+
+    return '\n'.join(out.lines) + '\n'
@@ -90,9 +90,18 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # The FTS5 index over textbooks (and its shadow tables) is managed by
+    # hand in a migration; keep autogenerate from trying to drop it.
+    def include_object(object, name, type_, reflected, compare_to):
+        if type_ == 'table' and name.startswith('textbooks_fts'):
+            return False
+        return True
+
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    if conf_args.get("include_object") is None:
+        conf_args["include_object"] = include_object
 
     connectable = get_engine()
 
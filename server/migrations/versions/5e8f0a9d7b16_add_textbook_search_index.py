@@ -0,0 +1,66 @@
+"""Add full-text search index over textbooks
+
+Revision ID: 5e8f0a9d7b16
+Revises: d41a7c2e8f53
+Create Date: 2026-10-18 12:03:48.551920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8f0a9d7b16'
+down_revision = 'd41a7c2e8f53'
+branch_labels = None
+depends_on = None
+
+# Must stay identical to TSVECTOR_SQL in search.py or PostgreSQL will not
+# use the index.
+TSVECTOR_SQL = (
+    "to_tsvector('english', coalesce(title, '') || ' ' || "
+    "coalesce(author, '') || ' ' || coalesce(subject, ''))"
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        # External-content FTS5 table: the text lives in textbooks, the
+        # triggers keep the index in step with every write.
+        op.execute(
+            "CREATE VIRTUAL TABLE textbooks_fts USING fts5("
+            "title, author, subject, content='textbooks', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        op.execute(
+            "CREATE TRIGGER textbooks_fts_ai AFTER INSERT ON textbooks BEGIN "
+            "INSERT INTO textbooks_fts(rowid, title, author, subject) "
+            "VALUES (new.id, new.title, new.author, new.subject); END"
+        )
+        op.execute(
+            "CREATE TRIGGER textbooks_fts_ad AFTER DELETE ON textbooks BEGIN "
+            "INSERT INTO textbooks_fts(textbooks_fts, rowid, title, author, subject) "
+            "VALUES ('delete', old.id, old.title, old.author, old.subject); END"
+        )
+        op.execute(
+            "CREATE TRIGGER textbooks_fts_au AFTER UPDATE ON textbooks BEGIN "
+            "INSERT INTO textbooks_fts(textbooks_fts, rowid, title, author, subject) "
+            "VALUES ('delete', old.id, old.title, old.author, old.subject); "
+            "INSERT INTO textbooks_fts(rowid, title, author, subject) "
+            "VALUES (new.id, new.title, new.author, new.subject); END"
+        )
+        op.execute("INSERT INTO textbooks_fts(textbooks_fts) VALUES ('rebuild')")
+    elif dialect == 'postgresql':
+        op.execute(f"CREATE INDEX ix_textbooks_search ON textbooks USING GIN ({TSVECTOR_SQL})")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS textbooks_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS textbooks_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS textbooks_fts_ai")
+        op.execute("DROP TABLE IF EXISTS textbooks_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_textbooks_search")
@@ -0,0 +1,30 @@
+"""Add digest columns to outbound_emails
+
+Revision ID: 9b2d6e0c41f7
+Revises: 3c7e1f4b9a2d
+Create Date: 2026-10-18 10:41:37.902154
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b2d6e0c41f7'
+down_revision = '3c7e1f4b9a2d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('outbound_emails', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('digest_key', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('digest_items', sa.String(), nullable=True))
+        batch_op.create_index('ix_outbound_emails_recipient_digest_key', ['recipient', 'digest_key'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('outbound_emails', schema=None) as batch_op:
+        batch_op.drop_index('ix_outbound_emails_recipient_digest_key')
+        batch_op.drop_column('digest_items')
+        batch_op.drop_column('digest_key')
@@ -0,0 +1,35 @@
+"""Add comment_count and watcher_count to posts
+
+Revision ID: c4f8b2a6d913
+Revises: a7c3e9d51b24
+Create Date: 2026-10-18 16:05:41.772903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f8b2a6d913'
+down_revision = 'a7c3e9d51b24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('watcher_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill from the base tables; afterwards the API keeps them current.
+    op.execute(
+        "UPDATE posts SET "
+        "comment_count = (SELECT COUNT(*) FROM comments WHERE comments.post_id = posts.id), "
+        "watcher_count = (SELECT COUNT(*) FROM watchlists WHERE watchlists.post_id = posts.id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.drop_column('watcher_count')
+        batch_op.drop_column('comment_count')
@@ -0,0 +1,54 @@
+"""Add indexes for foreign keys and ISBN lookups
+
+Revision ID: d41a7c2e8f53
+Revises: 9b2d6e0c41f7
+Create Date: 2026-10-18 11:15:04.227610
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41a7c2e8f53'
+down_revision = '9b2d6e0c41f7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Fails if the table already holds duplicate ISBNs; merge those rows
+    # (repointing posts/watchlists) before upgrading.
+    with op.batch_alter_table('textbooks', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_textbooks_isbn'), ['isbn'], unique=True)
+
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_posts_textbook_id'), ['textbook_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_posts_user_id'), ['user_id'], unique=False)
+
+    with op.batch_alter_table('comments', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_comments_post_id'), ['post_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_comments_user_id'), ['user_id'], unique=False)
+
+    with op.batch_alter_table('watchlists', schema=None) as batch_op:
+        batch_op.create_index('ix_watchlists_user_id_post_id', ['user_id', 'post_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_watchlists_post_id'), ['post_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_watchlists_textbook_id'), ['textbook_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('watchlists', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_watchlists_textbook_id'))
+        batch_op.drop_index(batch_op.f('ix_watchlists_post_id'))
+        batch_op.drop_index('ix_watchlists_user_id_post_id')
+
+    with op.batch_alter_table('comments', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_comments_user_id'))
+        batch_op.drop_index(batch_op.f('ix_comments_post_id'))
+
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_posts_user_id'))
+        batch_op.drop_index(batch_op.f('ix_posts_textbook_id'))
+
+    with op.batch_alter_table('textbooks', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_textbooks_isbn'))
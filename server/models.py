@@ -1,15 +1,15 @@
-from sqlalchemy_serializer import SerializerMixin
+from serializers import FastSerializerMixin, compile_serializers
 from sqlalchemy.orm import relationship, validates
 from sqlalchemy.ext.hybrid import hybrid_property 
-from sqlalchemy import CheckConstraint, ForeignKey, Integer, String, DateTime, func, BigInteger
+from sqlalchemy import Boolean, CheckConstraint, ForeignKey, Integer, String, DateTime, func, BigInteger
 from flask_login import UserMixin
-from flask_bcrypt import generate_password_hash, check_password_hash
+from passwords import PasswordHasherBusy, password_hasher
 from config import db
 import re
-from cloudinary.utils import cloudinary_url
+from images import image_url, image_variants
 
 
-class User(db.Model, SerializerMixin, UserMixin):
+class User(db.Model, FastSerializerMixin, UserMixin):
     __tablename__ = "users"
 
     serialize_only = ('id', 'email', 'name')
@@ -18,10 +18,14 @@ class User(db.Model, SerializerMixin, UserMixin):
     email = db.Column(String(255), unique=True, nullable=False)
     name = db.Column(String)
     _password_hash = db.Column(db.String)
+    # Kept in step with notifications.read by notifications.py, in the same
+    # transaction, so the bell badge is a primary-key read.
+    unread_notifications = db.Column(Integer, nullable=False, default=0, server_default='0')
 
     posts = relationship('Post', back_populates='user', cascade="all, delete-orphan")
     comments = relationship('Comment', back_populates='user', cascade="all, delete-orphan")
     watchlists = relationship('Watchlist', back_populates='user', cascade="all, delete-orphan")
+    notifications = relationship('Notification', back_populates='user', cascade="all, delete-orphan")
 
     textbooks = relationship('Textbook', secondary='posts', viewonly=True)
 
@@ -48,12 +52,23 @@ class User(db.Model, SerializerMixin, UserMixin):
     def password_hash(self, plain_text_password):
         if plain_text_password is None:
             raise ValueError("Password cannot be None")
-        self._password_hash = generate_password_hash(plain_text_password).decode('utf-8')
+        self._password_hash = password_hasher.hash(plain_text_password)
     
     def authenticate(self, password):
-        return check_password_hash(self._password_hash, password)
-
-class Textbook(db.Model, SerializerMixin):
+        if not password_hasher.check(self._password_hash, password):
+            return False
+        # Upgrade hashes made under an older BCRYPT_LOG_ROUNDS while we have
+        # the plain-text password; the caller commits. Best effort: if the
+        # pool is busy the login still succeeds and the upgrade waits.
+        if password_hasher.needs_rehash(self._password_hash):
+            try:
+                self.password_hash = password
+            except PasswordHasherBusy:
+                return True
+            password_hasher.rehashed += 1
+        return True
+
+class Textbook(db.Model, FastSerializerMixin):
     __tablename__ = "textbooks"
 
     serialize_only = ('id', 'author', 'title', 'isbn', 'subject')
@@ -62,7 +77,7 @@ class Textbook(db.Model, SerializerMixin):
     author = db.Column(String)
     title = db.Column(String)
     subject = db.Column(String)
-    isbn = db.Column(BigInteger, nullable=False)
+    isbn = db.Column(BigInteger, nullable=False, unique=True, index=True)
 
     posts = relationship('Post', back_populates='textbook', cascade="all, delete-orphan")
     watchlists = relationship('Watchlist', back_populates='textbook', cascade="all, delete-orphan")
@@ -93,14 +108,14 @@ class Textbook(db.Model, SerializerMixin):
     def validate_isbn(cls, isbn):
         return cls._validate_isbn(isbn)
 
-class Comment(db.Model, SerializerMixin):
+class Comment(db.Model, FastSerializerMixin):
     __tablename__ = "comments"
 
     serialize_rules = ('-user.comments', '-post.comments')
 
     id = db.Column(Integer, primary_key=True)
-    user_id = db.Column(Integer, ForeignKey('users.id'), nullable=False)
-    post_id = db.Column(Integer, ForeignKey('posts.id'), nullable=False)
+    user_id = db.Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    post_id = db.Column(Integer, ForeignKey('posts.id'), nullable=False, index=True)
     text = db.Column(String, nullable=False)
     created_at = db.Column(DateTime, server_default=func.now())
 
@@ -110,44 +125,59 @@ class Comment(db.Model, SerializerMixin):
     def __repr__(self):
         return f"<Comment(id={self.id}, user_id={self.user_id}, post_id={self.post_id})>"
 
-class Post(db.Model, SerializerMixin):
+class Post(db.Model, FastSerializerMixin):
     __tablename__ = "posts"
 
-    serialize_only = ('id', 'textbook_id', 'user_id', 'price', 'condition', 'created_at', 'img', 'image_url')
+    serialize_only = (
+        'id', 'textbook_id', 'user_id', 'price', 'condition', 'created_at', 'img', 'image_url',
+        'comment_count', 'watcher_count',
+    )
 
     id = db.Column(Integer, primary_key=True)
-    textbook_id = db.Column(Integer, ForeignKey('textbooks.id', ondelete='CASCADE'), nullable=False)
-    user_id = db.Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    textbook_id = db.Column(Integer, ForeignKey('textbooks.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = db.Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
     price = db.Column(Integer)
     condition = db.Column(String)
     created_at = db.Column(DateTime, server_default=func.now())
     img = db.Column(db.String, nullable=True)  # This now stores the Cloudinary public ID
+    # Denormalized; kept in step by counters.py and rebuilt by `flask repair-counts`.
+    comment_count = db.Column(Integer, nullable=False, default=0, server_default='0')
+    watcher_count = db.Column(Integer, nullable=False, default=0, server_default='0')
 
     user = relationship('User', back_populates='posts')
     textbook = relationship('Textbook', back_populates='posts')
     comments = relationship('Comment', back_populates='post', cascade="all, delete-orphan")
     watchlists = relationship('Watchlist', back_populates='post', cascade="all, delete-orphan")
+    # No delete cascade: deleting a listing keeps its notifications (and the
+    # unread counts) and just clears their post_id.
+    notifications = relationship('Notification', back_populates='post')
 
     def __repr__(self):
         return f"<Post(id={self.id}, textbook_id={self.textbook_id}, user_id={self.user_id}, price={self.price})>"
 
     def get_image_url(self):
         if self.img:
-            return cloudinary_url(self.img)[0]  # cloudinary_url returns a tuple (url, options)
+            return image_url(self.img)
         return None
 
     @property
     def image_url(self):
         return self.get_image_url()
 
+    @property
+    def image_variants(self):
+        if self.img:
+            return image_variants(self.img)
+        return None
+
     def to_dict(self):
         dict_repr = super().to_dict()
-        dict_repr['image_url'] = self.image_url
+        dict_repr['image_variants'] = self.image_variants
         return dict_repr
     
     
 
-class Watchlist(db.Model, SerializerMixin):
+class Watchlist(db.Model, FastSerializerMixin):
     __tablename__ = "watchlists"
 
     serialize_rules = ('-post.watchlists', '-textbook.watchlists', '-user.watchlists')
@@ -155,12 +185,70 @@ class Watchlist(db.Model, SerializerMixin):
 
     id = db.Column(Integer, primary_key=True)
     user_id = db.Column(Integer, ForeignKey('users.id'))
-    post_id = db.Column(Integer, ForeignKey('posts.id'))
-    textbook_id = db.Column(Integer, ForeignKey('textbooks.id'))
+    post_id = db.Column(Integer, ForeignKey('posts.id'), index=True)
+    textbook_id = db.Column(Integer, ForeignKey('textbooks.id'), index=True)
 
     user = relationship('User', back_populates='watchlists')
     post = relationship('Post', back_populates='watchlists')
     textbook = relationship('Textbook', back_populates='watchlists')
 
+    __table_args__ = (
+        db.Index('ix_watchlists_user_id_post_id', 'user_id', 'post_id'),
+    )
+
+    def __repr__(self):
+        return f"<Watchlist(id={self.id}, user_id={self.user_id}, post_id={self.post_id}, textbook_id={self.textbook_id})>"
+
+class Notification(db.Model, FastSerializerMixin):
+    __tablename__ = "notifications"
+
+    serialize_only = ('id', 'user_id', 'post_id', 'kind', 'message', 'read', 'created_at')
+
+    id = db.Column(Integer, primary_key=True)
+    user_id = db.Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    post_id = db.Column(Integer, ForeignKey('posts.id', ondelete='SET NULL'), index=True)
+    kind = db.Column(String, nullable=False)
+    message = db.Column(String, nullable=False)
+    read = db.Column(Boolean, nullable=False, default=False)
+    created_at = db.Column(DateTime, server_default=func.now())
+
+    user = relationship('User', back_populates='notifications')
+    post = relationship('Post', back_populates='notifications')
+
+    __table_args__ = (
+        db.Index('ix_notifications_user_id_id', 'user_id', 'id'),
+    )
+
     def __repr__(self):
-        return f"<Watchlist(id={self.id}, user_id={self.user_id}, post_id={self.post_id}, textbook_id={self.textbook_id})>"
\ No newline at end of file
+        return f"<Notification(id={self.id}, user_id={self.user_id}, kind={self.kind}, read={self.read})>"
+
+class OutboundEmail(db.Model, FastSerializerMixin):
+    __tablename__ = "outbound_emails"
+
+    serialize_only = ('id', 'recipient', 'subject', 'status', 'attempts', 'created_at', 'sent_at')
+
+    id = db.Column(Integer, primary_key=True)
+    recipient = db.Column(String(255), nullable=False)
+    subject = db.Column(String, nullable=False)
+    body = db.Column(String, nullable=False)
+    status = db.Column(String, nullable=False, default='pending')
+    attempts = db.Column(Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(DateTime, nullable=False)
+    claimed_by = db.Column(String)
+    claimed_at = db.Column(DateTime)
+    last_error = db.Column(String)
+    digest_key = db.Column(String)
+    digest_items = db.Column(String)
+    created_at = db.Column(DateTime, server_default=func.now())
+    sent_at = db.Column(DateTime)
+
+    __table_args__ = (
+        db.Index('ix_outbound_emails_status_next_attempt_at', 'status', 'next_attempt_at'),
+        db.Index('ix_outbound_emails_recipient_digest_key', 'recipient', 'digest_key'),
+    )
+
+    def __repr__(self):
+        return f"<OutboundEmail(id={self.id}, recipient={self.recipient}, status={self.status})>"
+
+
+compile_serializers(User, Textbook, Post, Comment, Watchlist, Notification, OutboundEmail)
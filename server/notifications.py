@@ -0,0 +1,99 @@
+from flask import request
+from sqlalchemy import select, update
+from config import db
+from models import Notification, User
+from pagination import decode_cursor, encode_cursor, parse_limit
+
+
+def notify(user_ids, kind, post_id, message):
+    """Add a notification for each of ``user_ids`` to the current session.
+
+    Each recipient's unread counter is bumped by the same transaction, so
+    the caller's commit writes both or neither.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return []
+    notifications = [
+        Notification(user_id=user_id, post_id=post_id, kind=kind, message=message)
+        for user_id in user_ids
+    ]
+    db.session.add_all(notifications)
+    db.session.execute(
+        update(User)
+        .where(User.id.in_(user_ids))
+        .values(unread_notifications=User.unread_notifications + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return notifications
+
+
+def unread_count(user_id):
+    """The user's unread counter, or None if there is no such user.
+
+    Reads the column directly rather than through the session, which may
+    hold a cached copy of the user from the identity cache.
+    """
+    return db.session.execute(select(User.unread_notifications).where(User.id == user_id)).scalar()
+
+
+def notifications_page(user_id):
+    """Newest-first keyset page of the user's notifications (``?cursor=&limit=``).
+
+    ``?unread=1`` limits the page to unread notifications.
+    """
+    limit = parse_limit(request.args.get('limit'))
+    before = decode_cursor(request.args.get('cursor'))
+
+    query = Notification.query.filter(Notification.user_id == user_id)
+    if request.args.get('unread') in ('1', 'true'):
+        query = query.filter(Notification.read.is_(False))
+    if before is not None:
+        query = query.filter(Notification.id < before)
+    rows = query.order_by(Notification.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+
+    return {'items': [row.to_dict() for row in rows], 'next_cursor': next_cursor}
+
+
+def mark_read(notification):
+    """Mark ``notification`` read and decrement its owner's counter, once.
+
+    The guarded UPDATE makes concurrent calls for the same notification
+    decrement the counter only once. The caller commits.
+    """
+    marked = db.session.execute(
+        update(Notification)
+        .where(Notification.id == notification.id, Notification.read.is_(False))
+        .values(read=True)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if marked:
+        db.session.execute(
+            update(User)
+            .where(User.id == notification.user_id)
+            .values(unread_notifications=User.unread_notifications - 1)
+            .execution_options(synchronize_session=False)
+        )
+    return bool(marked)
+
+
+def mark_all_read(user_id):
+    """Mark every unread notification of ``user_id`` read and zero the counter."""
+    marked = db.session.execute(
+        update(Notification)
+        .where(Notification.user_id == user_id, Notification.read.is_(False))
+        .values(read=True)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(unread_notifications=User.unread_notifications - marked)
+        .execution_options(synchronize_session=False)
+    )
+    return marked
@@ -0,0 +1,65 @@
+import base64
+import json
+from flask import request, current_app
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(last_id):
+    raw = json.dumps({'id': last_id}).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded))['id']
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor.")
+    if not isinstance(last_id, int) or isinstance(last_id, bool):
+        raise ValueError("Invalid cursor.")
+    return last_id
+
+
+def parse_limit(value):
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("Limit must be an integer.")
+    if limit < 1:
+        raise ValueError("Limit must be at least 1.")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def wants_pagination():
+    if 'limit' in request.args or 'cursor' in request.args:
+        return True
+    return not current_app.config.get('LEGACY_UNPAGINATED_LISTINGS', True)
+
+
+def paginate(query, column, serialize, many=False):
+    """Return one keyset page of ``query`` ordered on ``column``.
+
+    The page is located with ``column > last_seen`` instead of OFFSET, so
+    every page is an index range scan no matter how deep it is. With
+    ``many``, ``serialize`` gets the page's rows as one list.
+    """
+    limit = parse_limit(request.args.get('limit'))
+    after = decode_cursor(request.args.get('cursor'))
+
+    if after is not None:
+        query = query.filter(column > after)
+    rows = query.order_by(column).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(getattr(rows[-1], column.key))
+
+    items = serialize(rows) if many else [serialize(row) for row in rows]
+    return {'items': items, 'next_cursor': next_cursor}
@@ -0,0 +1,97 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+import bcrypt
+from config import app
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when PASSWORD_HASH_MAX_PENDING bcrypt calls are already queued,
+    or when one doesn't finish within PASSWORD_HASH_TIMEOUT."""
+
+
+class PasswordHasher:
+    """Runs bcrypt in a process pool so it never holds a request thread's CPU.
+
+    At most PASSWORD_HASH_MAX_PENDING hashes/checks may be in flight; past
+    that, callers get PasswordHasherBusy right away instead of queueing
+    behind a login burst. A call that outlives PASSWORD_HASH_TIMEOUT raises
+    PasswordHasherBusy too; its slot stays taken until the worker is done
+    with it. PASSWORD_HASH_WORKERS=0 hashes inline, as before.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._pool = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.rehashed = 0
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # The pool is created on a request thread while the writer,
+                # outbox and server threads run, so forking this process could
+                # copy a lock some other thread holds. Workers come from a
+                # clean forkserver (spawn where there is none) instead.
+                if 'forkserver' in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context('forkserver')
+                    # Don't import the app into the fork server; it has no use for it.
+                    context.set_forkserver_preload(['bcrypt'])
+                else:
+                    context = multiprocessing.get_context('spawn')
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.app.config['PASSWORD_HASH_WORKERS'],
+                    mp_context=context,
+                )
+                self._slots = threading.BoundedSemaphore(self.app.config['PASSWORD_HASH_MAX_PENDING'])
+            return self._pool, self._slots
+
+    def _call(self, fn, *args):
+        if not self.app.config['PASSWORD_HASH_WORKERS']:
+            return fn(*args)
+        pool, slots = self._executor()
+        if not slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PasswordHasherBusy("Too many password checks in progress")
+        try:
+            future = pool.submit(fn, *args)
+        except BaseException:
+            slots.release()
+            raise
+        # Free the slot when the worker is done, not when we stop waiting.
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            result = future.result(timeout=self.app.config['PASSWORD_HASH_TIMEOUT'])
+        except FutureTimeout:
+            future.cancel()
+            self.timed_out += 1
+            raise PasswordHasherBusy("Password check timed out")
+        self.completed += 1
+        return result
+
+    def hash(self, password):
+        salt = bcrypt.gensalt(rounds=self.app.config['BCRYPT_LOG_ROUNDS'])
+        return self._call(bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+    def check(self, password_hash, password):
+        if not password_hash:
+            return False
+        return self._call(bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8'))
+
+    def needs_rehash(self, password_hash):
+        return hash_rounds(password_hash) != self.app.config['BCRYPT_LOG_ROUNDS']
+
+
+def hash_rounds(password_hash):
+    """Work factor of a ``$2b$12$...`` bcrypt hash."""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+password_hasher = PasswordHasher(app)
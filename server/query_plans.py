@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""Query-plan regression check for the API endpoints.
+
+Builds a throwaway SQLite database from the migrations, seeds it, drives each
+endpoint in CHECKS through the Flask test client and runs EXPLAIN QUERY PLAN
+on every statement the request issued. Exits non-zero if any statement falls
+back to a full table scan. tests/test_query_plans.py runs the same CHECKS
+under pytest against the test database.
+
+A scan is tolerated only when the statement carries a LIMIT and SQLite does
+not need a temp B-tree to sort it, i.e. it walks an index in order and stops
+after one page. The unpaginated legacy listings and ?stream=1 read whole
+tables by design, so they are exercised in paginated form here.
+
+    python query_plans.py
+"""
+import os
+import re
+import sys
+import tempfile
+import threading
+
+if __name__ == '__main__':
+    _db_dir = tempfile.mkdtemp(prefix='query-plans-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_db_dir, 'plans.db')
+    # Every request must reach the database for its plan to be checked.
+    os.environ['RESPONSE_CACHE_ENABLED'] = '0'
+    # The mail dispatcher would start polling before the tables exist.
+    os.environ['OUTBOX_DISPATCHER'] = '0'
+
+from sqlalchemy import event, text
+from flask_migrate import upgrade
+from app import app
+from config import db
+from models import User, Textbook, Post, Comment, Watchlist, Notification
+from pagination import encode_cursor
+
+PASSWORD = 'password123'
+NUM_USERS = 50
+NUM_TEXTBOOKS = 200
+NUM_POSTS = 1000
+NUM_COMMENTS = 3000
+
+FULL_SCAN = re.compile(r'^SCAN (\w+)(?: USING (?:COVERING )?INDEX \w+)?$')
+# Subqueries SQLite builds first; scanning their result is not a table scan
+# (the plan lines that build them are checked on their own).
+SUBQUERY = re.compile(r'^(?:MATERIALIZE|CO-ROUTINE) (\w+)$')
+PLANNED = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+# (label, method, path, request kwargs). Paths may reference ids captured in
+# ``ids`` by seed(). Requests run in order and with the seeded owner logged in.
+CHECKS = [
+    ('login', 'POST', '/login', {'json': {'email': 'owner@plans.edu', 'password': PASSWORD}}),
+    ('check session', 'GET', '/check_session', {}),
+    ('list posts', 'GET', '/posts?limit=20', {}),
+    ('list posts, later page', 'GET', '/posts?limit=20&cursor={post_cursor}', {}),
+    ('list posts by user', 'GET', '/posts?user_id={owner_id}&limit=20', {}),
+    ('get post', 'GET', '/posts/{post_id}', {}),
+    ('list posts, latest comments', 'GET', '/posts?limit=20&embed_comments=3', {}),
+    ('get post, latest comments', 'GET', '/posts/{post_id}?embed_comments=2', {}),
+    ('list textbooks', 'GET', '/textbooks?limit=20', {}),
+    ('get textbook', 'GET', '/textbooks/{textbook_id}', {}),
+    ('list comments', 'GET', '/comments?limit=20', {}),
+    ('list post comments', 'GET', '/posts/{post_id}/comments', {}),
+    ('list users', 'GET', '/users?limit=20', {}),
+    ('get watchlist', 'GET', '/users/{owner_id}/watchlist', {}),
+    ('get watchlist since', 'GET', '/users/{owner_id}/watchlist?since=1&limit=10', {}),
+    ('search', 'GET', '/search?q=title 1', {}),
+    ('search by subject', 'GET', '/search?q=author&subject=Mathematics', {}),
+    ('search by isbn prefix', 'GET', '/search?q=978000000', {}),
+    ('create textbook (existing isbn)', 'POST', '/textbooks',
+     {'data': {'author': 'A', 'title': 'T', 'isbn': '{isbn}'}}),
+    ('create post', 'POST', '/posts',
+     {'data': {'user_id': '{owner_id}', 'isbn': '{isbn}', 'price': '40', 'condition': 'Good'}}),
+    ('bulk create posts', 'POST', '/posts/bulk',
+     {'json': [{'user_id': '{owner_id}', 'isbn': '{isbn}', 'price': '30', 'condition': 'Good'},
+               {'user_id': '{owner_id}', 'isbn': '9781111111111', 'price': '25', 'condition': 'Fair',
+                'title': 'New Title', 'author': 'New Author'}]}),
+    ('update post (price drop)', 'PUT', '/posts/{post_id}', {'data': {'price': '1'}}),
+    ('add comment', 'POST', '/posts/{post_id}/comments', {'json': {'text': 'Still available?'}}),
+    ('delete comment', 'DELETE', '/posts/{post_id}/comments/{comment_id}', {}),
+    ('add to watchlist', 'POST', '/users/{owner_id}/watchlist',
+     {'json': {'post_id': '{other_post_id}', 'textbook_id': '{other_textbook_id}'}}),
+    ('remove from watchlist', 'DELETE', '/users/{owner_id}/watchlist/{other_post_id}', {}),
+    ('list notifications', 'GET', '/users/{owner_id}/notifications?limit=20', {}),
+    ('list unread notifications', 'GET', '/users/{owner_id}/notifications?unread=1&limit=20', {}),
+    ('unread notification count', 'GET', '/users/{owner_id}/notifications/unread_count', {}),
+    ('mark notification read', 'PATCH', '/notifications/{notification_id}', {'json': {'read': True}}),
+    ('mark all notifications read', 'PATCH', '/users/{owner_id}/notifications', {'json': {'read': True}}),
+    ('delete post', 'DELETE', '/posts/{post_id}', {}),
+    ('delete textbook', 'DELETE', '/textbooks/{spare_textbook_id}', {}),
+    ('delete user', 'DELETE', '/users/{spare_user_id}', {}),
+]
+
+
+def seed():
+    owner = User(email='owner@plans.edu', name='Owner')
+    owner.password_hash = PASSWORD
+    users = [owner] + [User(email=f'user{i}@plans.edu', name=f'User {i}') for i in range(1, NUM_USERS)]
+    for user in users[1:]:
+        user._password_hash = owner._password_hash
+    db.session.add_all(users)
+
+    textbooks = [
+        Textbook(author=f'Author {i}', title=f'Title {i}', subject='Mathematics', isbn=9780000000000 + i)
+        for i in range(NUM_TEXTBOOKS)
+    ]
+    db.session.add_all(textbooks)
+    db.session.flush()
+
+    posts = [
+        Post(user_id=users[i % NUM_USERS].id, textbook_id=textbooks[i % NUM_TEXTBOOKS].id,
+             price=20 + i % 100, condition='Good')
+        for i in range(NUM_POSTS)
+    ]
+    db.session.add_all(posts)
+    db.session.flush()
+
+    comments = [
+        Comment(user_id=users[i % NUM_USERS].id, post_id=posts[i % NUM_POSTS].id, text=f'Comment {i}')
+        for i in range(NUM_COMMENTS)
+    ]
+    db.session.add_all(comments)
+    watchlists = [
+        Watchlist(user_id=users[i % NUM_USERS].id, post_id=posts[(i * 7) % NUM_POSTS].id,
+                  textbook_id=posts[(i * 7) % NUM_POSTS].textbook_id)
+        for i in range(NUM_USERS * 10)
+    ]
+    db.session.add_all(watchlists)
+    notifications = [
+        Notification(user_id=users[i % NUM_USERS].id, post_id=posts[i % NUM_POSTS].id,
+                     kind='comment', message=f'Notification {i}', read=i % 3 == 0)
+        for i in range(NUM_USERS * 20)
+    ]
+    db.session.add_all(notifications)
+    for user in users:
+        user.unread_notifications = sum(1 for n in notifications if n.user_id == user.id and not n.read)
+    db.session.commit()
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+
+    owned = [post for post in posts if post.user_id == owner.id]
+    other = next(post for post in posts if post.user_id != owner.id)
+    spare_textbook = textbooks[-1]
+    comment = next(c for c in comments if c.post_id == owned[0].id and c.user_id == owner.id)
+    return {
+        'owner_id': owner.id,
+        'post_id': owned[0].id,
+        'post_cursor': encode_cursor(posts[NUM_POSTS // 2].id),
+        'textbook_id': textbooks[0].id,
+        'isbn': textbooks[0].isbn,
+        'comment_id': comment.id,
+        'other_post_id': other.id,
+        'other_textbook_id': other.textbook_id,
+        'spare_textbook_id': spare_textbook.id,
+        'spare_user_id': users[-1].id,
+        'notification_id': next(n.id for n in notifications if n.user_id == owner.id and not n.read),
+    }
+
+
+def fill(value, ids):
+    if isinstance(value, str):
+        return value.format(**ids)
+    if isinstance(value, dict):
+        return {key: fill(item, ids) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill(item, ids) for item in value]
+    return value
+
+
+def full_scans(connection, statement, parameters):
+    plan = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+    details = [row[-1] for row in plan]
+    bounded = re.search(r'\bLIMIT\b', statement) and not any('TEMP B-TREE' in d for d in details)
+    if bounded:
+        return details, []
+    subqueries = {m.group(1) for m in map(SUBQUERY.match, details) if m}
+    scans = [m for m in map(FULL_SCAN.match, details) if m and m.group(1) not in subqueries]
+    return details, [m.string for m in scans]
+
+
+def run_checks():
+    """Seed the (empty, migrated) database and drive every request in CHECKS.
+
+    Returns ``(label, method, path, status, statements)`` per check, where
+    ``statements`` are the ``(statement, parameters)`` the request issued.
+    """
+    with app.app_context():
+        ids = seed()
+        engine = db.engine
+
+    captured = []
+    main_thread = threading.get_ident()
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        # Background workers (e.g. the outbox dispatcher) are not endpoints.
+        if threading.get_ident() == main_thread and not executemany:
+            captured.append((statement, parameters))
+
+    # Requests run outside the seeding app context so each gets a fresh
+    # session and nothing is served from a warm identity map.
+    event.listen(engine, 'before_cursor_execute', capture)
+    client = app.test_client()
+    results = []
+    try:
+        for label, method, path, kwargs in CHECKS:
+            captured.clear()
+            response = client.open(fill(path, ids), method=method, **fill(kwargs, ids))
+            results.append((label, method, path, response.status_code, list(captured)))
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+    return results
+
+
+def plan_problems(connection, statements):
+    """``(statement, plan details)`` for each of ``statements`` that does a full scan."""
+    problems = []
+    for statement, parameters in statements:
+        if not statement.lstrip().upper().startswith(PLANNED):
+            continue
+        details, scans = full_scans(connection, statement, parameters)
+        if scans:
+            problems.append((statement, details))
+    return problems
+
+
+def main():
+    with app.app_context():
+        upgrade(directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations'))
+        engine = db.engine
+    results = run_checks()
+
+    failures = 0
+    with engine.connect() as connection:
+        for label, method, path, status, statements in results:
+            problems = plan_problems(connection, statements)
+            mark = 'FAIL' if problems or status >= 500 else 'ok'
+            print(f"{mark:4} {label:32} {method:6} {path:50} {status} ({len(statements)} statements)")
+            if status >= 500:
+                failures += 1
+            for statement, details in problems:
+                failures += 1
+                print('     ' + ' '.join(statement.split()))
+                for detail in details:
+                    print('       -> ' + detail)
+
+    print(f"\n{failures} problem(s) found" if failures else "\nNo full table scans.")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
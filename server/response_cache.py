@@ -0,0 +1,155 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, Response
+from flask_restful.utils import unpack
+from config import app, api
+from streaming import wants_stream
+
+
+class CachedResponse:
+    __slots__ = ('body', 'etag', 'headers', 'tags', 'expires_at')
+
+    def __init__(self, body, headers, tags, expires_at):
+        self.body = body
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.headers = headers
+        self.tags = tags
+        self.expires_at = expires_at
+
+    def to_response(self):
+        headers = {'ETag': f'"{self.etag}"', 'Cache-Control': 'no-cache'}
+        if self.etag in request.if_none_match:
+            return Response(status=304, headers=headers)
+        response = Response(self.body, 200, self.headers)
+        response.headers.update(headers)
+        return response
+
+
+class ResponseCache:
+    """Bounded LRU of rendered GET responses, invalidated by tag.
+
+    Every entry carries the tags of the rows it was built from (``post:5``,
+    ``textbook:2``, ``posts:list``...). Writes call :meth:`invalidate` with
+    the tags they touched and only those entries are dropped. The TTL bounds
+    how long another worker's copy can lag behind a write made here.
+    """
+
+    def __init__(self, max_entries, max_bytes, ttl):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._bytes = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def store(self, key, body, headers, tags, generation):
+        entry = CachedResponse(body, headers, frozenset(tags), time.monotonic() + self.ttl)
+        with self._lock:
+            # A write landed while this body was being built; it may already
+            # be stale, so serve it once but don't keep it.
+            if generation != self._generation or len(body) > self.max_bytes:
+                return entry
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += len(body)
+            for tag in entry.tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        return entry
+
+    def invalidate(self, *tags):
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.body)
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+response_cache = ResponseCache(
+    max_entries=app.config['RESPONSE_CACHE_MAX_ENTRIES'],
+    max_bytes=app.config['RESPONSE_CACHE_MAX_BYTES'],
+    ttl=app.config['RESPONSE_CACHE_TTL'],
+)
+
+
+def cache_key():
+    return request.path + '?' + '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+
+
+def cached(tagger):
+    """Serve a Resource.get through the response cache.
+
+    ``tagger(kwargs, data)`` returns the tags for a freshly rendered 200
+    response. Non-200 results and streamed responses are passed through
+    untouched.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(resource, *args, **kwargs):
+            if not app.config['RESPONSE_CACHE_ENABLED'] or wants_stream():
+                return view(resource, *args, **kwargs)
+
+            key = cache_key()
+            entry = response_cache.get(key)
+            if entry is None:
+                generation = response_cache.generation
+                result = view(resource, *args, **kwargs)
+                if isinstance(result, Response):
+                    return result
+                data, status, headers = unpack(result)
+                if status != 200:
+                    return result
+                rendered = api.make_response(data, status, headers)
+                entry = response_cache.store(
+                    key,
+                    rendered.get_data(),
+                    [(name, value) for name, value in rendered.headers if name.lower() != 'content-length'],
+                    tagger(kwargs, data),
+                    generation,
+                )
+            return entry.to_response()
+        return wrapper
+    return decorator
@@ -0,0 +1,102 @@
+import re
+from sqlalchemy import Float, Integer, func, text
+from config import db
+from listings import listing_query
+from models import Post, Textbook
+
+# Must stay identical to the expression indexed by the 5e8f0a9d7b16 migration.
+TSVECTOR_SQL = (
+    "to_tsvector('english', coalesce(title, '') || ' ' || "
+    "coalesce(author, '') || ' ' || coalesce(subject, ''))"
+)
+
+# bm25() column weights for textbooks_fts(title, author, subject).
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+ISBN_DIGITS = 13
+MIN_ISBN_PREFIX = 3
+
+
+def tokenize(value):
+    return re.findall(r'\w+', value.lower())
+
+
+def isbn_prefix_range(q):
+    digits = q.replace('-', '').replace(' ', '')
+    if not digits.isdigit() or not MIN_ISBN_PREFIX <= len(digits) <= ISBN_DIGITS:
+        return None
+    scale = 10 ** (ISBN_DIGITS - len(digits))
+    prefix = int(digits)
+    return prefix * scale, (prefix + 1) * scale - 1
+
+
+def fts5_match(q, subject):
+    # Every term is quoted (so user input can never be read as FTS syntax)
+    # and prefix-matched, which gives search-as-you-type behaviour.
+    terms = [f'"{term}"*' for term in tokenize(q)]
+    if subject:
+        phrase = ' '.join(tokenize(subject))
+        if phrase:
+            terms.append(f'subject : "{phrase}"')
+    return ' AND '.join(terms)
+
+
+def ranked_sqlite(q, subject):
+    match = fts5_match(q, subject)
+    if not match:
+        return None
+    weights = ', '.join(str(weight) for weight in BM25_WEIGHTS)
+    return text(
+        f"SELECT rowid AS textbook_id, bm25(textbooks_fts, {weights}) AS rank "
+        "FROM textbooks_fts WHERE textbooks_fts MATCH :match"
+    ).bindparams(match=match).columns(textbook_id=Integer, rank=Float).subquery('ranked')
+
+
+def ranked_postgresql(q, subject):
+    terms = [f"{term}:*" for term in tokenize(q)]
+    if subject:
+        terms.extend(tokenize(subject))
+    if not terms:
+        return None
+    # ts_rank is "higher is better"; negate it so both dialects sort ascending.
+    return text(
+        f"SELECT id AS textbook_id, -ts_rank({TSVECTOR_SQL}, to_tsquery('english', :tsquery)) AS rank "
+        f"FROM textbooks WHERE {TSVECTOR_SQL} @@ to_tsquery('english', :tsquery)"
+    ).bindparams(tsquery=' & '.join(terms)).columns(textbook_id=Integer, rank=Float).subquery('ranked')
+
+
+def search_posts(q, subject=None, limit=50):
+    """Posts whose textbook matches ``q``, best match first.
+
+    A query that looks like (part of) an ISBN is matched as an ISBN prefix;
+    anything else goes through the full-text index, ranked with BM25 on
+    SQLite and ts_rank on PostgreSQL.
+    """
+    q = (q or '').strip()
+    subject = (subject or '').strip()
+
+    isbn_range = isbn_prefix_range(q)
+    if isbn_range is not None:
+        query = (
+            listing_query()
+            .join(Textbook, Textbook.id == Post.textbook_id)
+            .filter(Textbook.isbn.between(*isbn_range))
+        )
+        if subject:
+            query = query.filter(func.lower(Textbook.subject) == subject.lower())
+        return query.order_by(Textbook.isbn, Post.id).limit(limit).all()
+
+    if db.engine.dialect.name == 'postgresql':
+        ranked = ranked_postgresql(q, subject)
+    else:
+        ranked = ranked_sqlite(q, subject)
+    if ranked is None:
+        return []
+
+    query = listing_query().join(ranked, ranked.c.textbook_id == Post.textbook_id)
+    if subject:
+        # The index matches the subject as a phrase; insist on the exact value.
+        query = query.join(Textbook, Textbook.id == Post.textbook_id).filter(
+            func.lower(Textbook.subject) == subject.lower()
+        )
+    return query.order_by(ranked.c.rank, Post.id).limit(limit).all()
@@ -1,14 +1,21 @@
 #!/usr/bin/env python3
 
+import argparse
+import os
+import random
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from random import randint, choice as rc
 from faker import Faker
 from app import app
 from models import db, User, Textbook, Comment, Post, Watchlist
+from counters import repair_counts
 from cloudinary.uploader import upload
 import cloudinary
 from config import CLOUDINARY_UPLOAD_PRESET, cloudinary
 import time
+from sqlalchemy import func, insert, text as sql_text
 from sqlalchemy.exc import IntegrityError
 from io import BytesIO
 
@@ -328,33 +335,36 @@ def seed_posts(users, textbooks, num_posts=30):
             
     return posts
 
+COMMENT_TEMPLATES = [
+    "Is this still available?",
+    "What's the condition of the book like?",
+    "Would you accept {}?",
+    "I'm interested in this book. Is the price negotiable?",
+    "Does it have any highlighting or notes?",
+    "Are there any missing pages?",
+    "Can you meet on campus?",
+    "Do you have any other books for {}?",
+    "Is this the latest edition?",
+    "Does it come with the access code?"
+]
+
+CONDITIONS = ['New', 'Like New', 'Very Good', 'Good', 'Acceptable']
+
+def comment_text(rng=random):
+    """Fill in a random comment template"""
+    template = rng.choice(COMMENT_TEMPLATES)
+    if "{}" not in template:
+        return template
+    if "accept" in template.lower():
+        return template.format(f"${rng.randint(20, 150)}")
+    return template.format(rng.choice(SUBJECTS))
+
 def seed_comments(users, posts, num_comments=50):
     """Create realistic comments for posts"""
     print("🌱 Seeding comments...")
-    comment_templates = [
-        "Is this still available?",
-        "What's the condition of the book like?",
-        "Would you accept {}?",
-        "I'm interested in this book. Is the price negotiable?",
-        "Does it have any highlighting or notes?",
-        "Are there any missing pages?",
-        "Can you meet on campus?",
-        "Do you have any other books for {}?",
-        "Is this the latest edition?",
-        "Does it come with the access code?"
-    ]
-    
     for i in range(num_comments):
         try:
-            template = rc(comment_templates)
-            if "{}" in template:
-                if "price" in template.lower():
-                    text = template.format(f"${randint(20, 150)}")
-                else:
-                    text = template.format(rc(SUBJECTS))
-            else:
-                text = template
-                
+            text = comment_text()
             comment = Comment(
                 user_id=rc(users).id,
                 post_id=rc(posts).id,
@@ -395,7 +405,218 @@ def seed_watchlists(users, posts, num_watchlists=40):
             db.session.rollback()
             print(f"❌ Error creating watchlist item {i}: {str(e)}")
 
+# Scale mode: large, reproducible datasets for load tests. Every value comes
+# from a seeded RNG, rows are written with one executemany per batch, and
+# covers come from a local fixture directory so no network is needed.
+
+COVER_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'covers')
+COVER_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+
+# Rows per post for each table in a --scale dataset.
+SCALE_RATIOS = {
+    'users': 0.1,
+    'textbooks': 0.05,
+    'comments': 2,
+    'watchlists': 1,
+}
+
+def cover_files(directory):
+    """Sorted image file names in the fixture directory"""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name for name in os.listdir(directory) if name.lower().endswith(COVER_EXTENSIONS))
+
+def fetch_covers(directory=COVER_FIXTURES_DIR, workers=8):
+    """Download every known cover URL into the fixture directory, in parallel"""
+    os.makedirs(directory, exist_ok=True)
+    urls = sorted({url for covers in (TEXTBOOK_COVERS, TEXTBOOK_COVER_FALLBACKS) for group in covers.values() for url in group})
+    missing = [url for url in urls if not os.path.exists(os.path.join(directory, url.rsplit('/', 1)[-1]))]
+    print(f"🔗 Fetching {len(missing)} of {len(urls)} covers with {workers} workers...")
+
+    def fetch(url):
+        image_data = download_image(url)
+        if image_data is None:
+            return False
+        with open(os.path.join(directory, url.rsplit('/', 1)[-1]), 'wb') as f:
+            f.write(image_data.getvalue())
+        return True
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        fetched = sum(pool.map(fetch, missing))
+    print(f"✅ Fetched {fetched} covers into {directory}")
+
+def upload_covers(directory=COVER_FIXTURES_DIR, workers=8):
+    """Upload the fixture covers to Cloudinary in parallel; returns their public ids"""
+    def push(name):
+        try:
+            result = upload(
+                os.path.join(directory, name),
+                folder="textbook_covers",
+                upload_preset=CLOUDINARY_UPLOAD_PRESET,
+                resource_type="auto"
+            )
+            return result['public_id']
+        except Exception as e:
+            print(f"⚠️ Upload of {name} failed: {str(e)}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return [public_id for public_id in pool.map(push, cover_files(directory)) if public_id]
+
+def local_cover_ids(directory=COVER_FIXTURES_DIR):
+    """Public ids for the fixture covers, assuming they live under textbook_covers/"""
+    return [f"textbook_covers/{os.path.splitext(name)[0]}" for name in cover_files(directory)]
+
+def next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+def bulk_insert(model, rows, batch_size):
+    """Insert an iterable of row dicts with one executemany per batch"""
+    started = time.perf_counter()
+    total = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.session.execute(insert(model.__table__), batch)
+            db.session.commit()
+            total += len(batch)
+            batch = []
+            print(f"   {model.__tablename__}: {total:,} rows", end='\r')
+    if batch:
+        db.session.execute(insert(model.__table__), batch)
+        db.session.commit()
+        total += len(batch)
+    print(f"✅ Inserted {total:,} {model.__tablename__} in {time.perf_counter() - started:.1f}s")
+    return total
+
+def seed_scale(num_posts, seed=42, batch_size=10000, cover_ids=()):
+    """Generate a deterministic dataset built around ``num_posts`` posts"""
+    rng = random.Random(seed)
+    scale_fake = Faker()
+    scale_fake.seed_instance(seed)
+    counts = {table: max(1, int(num_posts * ratio)) for table, ratio in SCALE_RATIOS.items()}
+    print(f"🌱 Scale seed {seed}: {num_posts:,} posts, " + ", ".join(f"{n:,} {t}" for t, n in counts.items()))
+
+    # One bcrypt hash shared by every generated user; hashing each one would
+    # take longer than the rest of the seed put together.
+    hasher = User()
+    hasher.password_hash = 'password123'
+    password_hash = hasher._password_hash
+
+    first_user = next_id(User)
+    num_users = counts['users']
+    bulk_insert(User, (
+        {
+            'id': first_user + i,
+            'name': name,
+            'email': f"{name.lower().replace(' ', '.')}.{first_user + i}@{rng.choice(FAKE_UNIVERSITIES)}",
+            '_password_hash': password_hash,
+        }
+        for i, name in ((i, scale_fake.name()) for i in range(num_users))
+    ), batch_size)
+
+    first_textbook = next_id(Textbook)
+    num_textbooks = counts['textbooks']
+    first_isbn = max((db.session.query(func.max(Textbook.isbn)).scalar() or 0) + 1, 9780000000000)
+
+    def textbook_rows():
+        for i in range(num_textbooks):
+            subject = rng.choice(SUBJECTS)
+            yield {
+                'id': first_textbook + i,
+                'author': scale_fake.name(),
+                'title': rng.choice(BOOK_TITLES[subject]),
+                'subject': subject,
+                'isbn': first_isbn + i,
+            }
+    bulk_insert(Textbook, textbook_rows(), batch_size)
+
+    epoch = datetime(2024, 1, 1)
+    year = int(timedelta(days=365).total_seconds())
+    first_post = next_id(Post)
+    post_textbooks = []
+
+    def post_rows():
+        for i in range(num_posts):
+            textbook_id = first_textbook + rng.randrange(num_textbooks)
+            post_textbooks.append(textbook_id)
+            yield {
+                'id': first_post + i,
+                'textbook_id': textbook_id,
+                'user_id': first_user + rng.randrange(num_users),
+                'price': rng.randint(20, 200),
+                'condition': rng.choice(CONDITIONS),
+                'created_at': epoch + timedelta(seconds=rng.randrange(year)),
+                'img': rng.choice(cover_ids) if cover_ids else None,
+            }
+    bulk_insert(Post, post_rows(), batch_size)
+
+    bulk_insert(Comment, (
+        {
+            'user_id': first_user + rng.randrange(num_users),
+            'post_id': first_post + rng.randrange(num_posts),
+            'text': comment_text(rng),
+            'created_at': epoch + timedelta(seconds=rng.randrange(year)),
+        }
+        for _ in range(counts['comments'])
+    ), batch_size)
+
+    def watchlist_rows():
+        # Deduplicated in memory instead of probing the table per row.
+        seen = set()
+        attempts = 0
+        while len(seen) < counts['watchlists'] and attempts < counts['watchlists'] * 3:
+            attempts += 1
+            user_id = first_user + rng.randrange(num_users)
+            index = rng.randrange(num_posts)
+            if (user_id, index) in seen:
+                continue
+            seen.add((user_id, index))
+            yield {'user_id': user_id, 'post_id': first_post + index, 'textbook_id': post_textbooks[index]}
+    bulk_insert(Watchlist, watchlist_rows(), batch_size)
+
+    # Rows went in through Core, so the denormalized counters start from here.
+    repair_counts()
+    db.session.commit()
+
+    if db.engine.dialect.name == 'sqlite':
+        db.session.execute(sql_text('ANALYZE'))
+        db.session.commit()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Seed the database with sample data.")
+    parser.add_argument('--scale', type=int, metavar='POSTS',
+                        help="build a deterministic load-test dataset with this many posts")
+    parser.add_argument('--seed', type=int, default=42, help="random seed for --scale (default 42)")
+    parser.add_argument('--batch-size', type=int, default=10000, help="rows per INSERT batch (default 10000)")
+    parser.add_argument('--covers', default=COVER_FIXTURES_DIR, help="directory of cover image fixtures")
+    parser.add_argument('--fetch-covers', action='store_true',
+                        help="download the known cover URLs into --covers (then seed only if --scale is given)")
+    parser.add_argument('--upload-covers', action='store_true',
+                        help="with --scale: upload the fixture covers to Cloudinary and use the returned public ids")
+    parser.add_argument('--workers', type=int, default=8, help="threads for cover downloads and uploads")
+    args = parser.parse_args()
+    if args.upload_covers and not args.scale:
+        parser.error("--upload-covers only applies to --scale")
+    return args
+
 if __name__ == '__main__':
+    args = parse_args()
+    if args.fetch_covers:
+        fetch_covers(args.covers, args.workers)
+        if not args.scale:
+            exit(0)
+    if args.scale:
+        with app.app_context():
+            cover_ids = upload_covers(args.covers, args.workers) if args.upload_covers else local_cover_ids(args.covers)
+            if not cover_ids:
+                print(f"⚠️ No covers in {args.covers}; posts will have no image")
+            started = time.perf_counter()
+            seed_scale(args.scale, seed=args.seed, batch_size=args.batch_size, cover_ids=cover_ids)
+            print(f"\n✨ Scale seed complete in {time.perf_counter() - started:.1f}s")
+        exit(0)
+
     with app.app_context():
         print("🌱 Starting seed process...")
         users = seed_users()
@@ -415,5 +636,7 @@ if __name__ == '__main__':
         
         seed_comments(users, posts)
         seed_watchlists(users, posts)
+        repair_counts()
+        db.session.commit()
         
         print("\n✨ Seeding complete! Database is ready.")
\ No newline at end of file
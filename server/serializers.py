@@ -0,0 +1,110 @@
+from sqlalchemy import Date, DateTime, Time, inspect as sql_inspect
+from sqlalchemy.orm import ColumnProperty, RelationshipProperty
+from sqlalchemy_serializer import SerializerMixin
+from sqlalchemy_serializer.lib.schema import Schema
+
+
+class FastSerializerMixin(SerializerMixin):
+    """SerializerMixin whose argument-less ``to_dict()`` uses a compiled function.
+
+    ``compile_serializers()`` turns each model's ``serialize_only`` /
+    ``serialize_rules`` into a plain function that reads attributes straight
+    off the instance, producing the same dict the mixin would, key order
+    included. Calls that pass ``only``/``rules``/format overrides still go
+    through the mixin.
+    """
+
+    _compiled_serializer = None
+
+    def to_dict(self, *args, **kwargs):
+        serializer = type(self)._compiled_serializer
+        if serializer is None or args or kwargs:
+            return super().to_dict(*args, **kwargs)
+        return serializer(self)
+
+
+def _formatter(fmt):
+    def format_value(value):
+        return None if value is None else value.strftime(fmt)
+    return format_value
+
+
+def _column_converter(model, column):
+    # Mirrors the type dispatch in sqlalchemy_serializer.Serializer for the
+    # column types our models use; anything else is passed through as-is,
+    # which is also what the mixin does for str/int/float/bool/None.
+    if isinstance(column.type, Time):
+        return _formatter(model.time_format)
+    if isinstance(column.type, DateTime):
+        return _formatter(model.datetime_format)
+    if isinstance(column.type, Date):
+        return _formatter(model.date_format)
+    return None
+
+
+def _nested(serializer, uselist):
+    if uselist:
+        def serialize_many(values):
+            return [serializer(value) for value in values]
+        return serialize_many
+
+    def serialize_one(value):
+        return None if value is None else serializer(value)
+    return serialize_one
+
+
+def _fields(model, schema):
+    """The keys SerializerMixin emits for ``model`` under ``schema``, in its order.
+
+    Mirrors Serializer.serialize_model with the library's own Schema. The
+    mixin walks a set of key names, so its key order is whatever that set's
+    iteration order is in this process; building the same set the same way
+    gives the compiled function the same order, and byte-identical JSON.
+    """
+    schema.update(only=model.serialize_only, extend=model.serialize_rules)
+    keys = schema.keys
+    if schema.is_greedy:
+        keys.update({attr.key for attr in sql_inspect(model).attrs})
+    return [key for key in keys if schema.is_included(key=key)]
+
+
+def compile_serializer(model, root=None, schema=None, path=()):
+    """Build the serializer for ``model`` as reached through ``schema``.
+
+    ``root`` is the model ``to_dict()`` was called on; like the mixin, its
+    date formats apply to every nested value.
+    """
+    root = root or model
+    schema = schema or Schema()
+    path = path + (model,)
+    mapper = sql_inspect(model)
+    namespace = {}
+    items = []
+    for index, field in enumerate(_fields(model, schema)):
+        attr = mapper.attrs.get(field)
+        expression = f'obj.{field}'
+        if isinstance(attr, ColumnProperty):
+            converter = _column_converter(root, attr.columns[0])
+            if converter is not None:
+                namespace[f'_c{index}'] = converter
+                expression = f'_c{index}({expression})'
+        elif isinstance(attr, RelationshipProperty):
+            target = attr.mapper.class_
+            if target in path:
+                raise TypeError(f"{model.__name__}.{field}: {target.__name__} would serialize itself recursively")
+            nested = compile_serializer(target, root, schema.fork(key=field), path)
+            namespace[f'_c{index}'] = _nested(nested, attr.uselist)
+            expression = f'_c{index}({expression})'
+        elif not hasattr(model, field):
+            raise TypeError(f"{model.__name__} has no attribute {field!r} to serialize")
+        items.append(f'{field!r}: {expression}')
+
+    source = f"def serialize_{model.__tablename__}(obj):\n    return {{{', '.join(items)}}}\n"
+    exec(compile(source, f'<serializer {model.__name__}>', 'exec'), namespace)
+    return namespace[f'serialize_{model.__tablename__}']
+
+
+def compile_serializers(*models):
+    """Compile and install fast serializers; call once every model is defined."""
+    for model in models:
+        model._compiled_serializer = compile_serializer(model)
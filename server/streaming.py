@@ -0,0 +1,38 @@
+import json
+from flask import request, Response, stream_with_context
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_BATCH_SIZE = 500
+
+
+def wants_stream():
+    if request.args.get('stream') == '1':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def stream_ndjson(query, column, serialize, batch_size=None, many=False):
+    """Stream ``query`` as newline-delimited JSON, one record per line.
+
+    Rows are read ``batch_size`` (STREAM_BATCH_SIZE) at a time, each batch a keyset page after
+    the last ``column`` value seen (like paginate()), and written out as
+    soon as they are serialized, so memory stays flat however large the
+    collection is. Paging rather than ``yield_per`` keeps the query's eager
+    loads usable. With ``many``, ``serialize`` is called once per batch
+    with its list of rows and returns the list of records.
+    """
+    batch_size = batch_size or STREAM_BATCH_SIZE
+
+    def generate():
+        last = None
+        while True:
+            page = query if last is None else query.filter(column > last)
+            rows = page.order_by(column).limit(batch_size).all()
+            records = serialize(rows) if many else [serialize(row) for row in rows]
+            for record in records:
+                yield json.dumps(record) + '\n'
+            if len(rows) < batch_size:
+                return
+            last = getattr(rows[-1], column.key)
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+# One throwaway database for the whole run, built from the migrations before
+# the app is imported.
+_db_dir = tempfile.mkdtemp(prefix='server-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_db_dir, 'test.db')
+os.environ['RESPONSE_CACHE_ENABLED'] = '0'
+os.environ['PASSWORD_HASH_WORKERS'] = '0'
+os.environ['LOG_LEVEL'] = 'ERROR'
+os.environ['OUTBOX_DISPATCHER'] = '0'
+
+from sqlalchemy import event
+from flask_migrate import upgrade
+from app import app as flask_app
+from config import db
+from identity_cache import identity_cache
+from response_cache import response_cache
+
+with flask_app.app_context():
+    upgrade(directory=os.path.join(SERVER_DIR, 'migrations'))
+
+
+def empty_database():
+    with flask_app.app_context():
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+    identity_cache.clear()
+    response_cache.clear()
+
+
+@pytest.fixture
+def app():
+    """The app over an empty database; each test seeds what it needs."""
+    empty_database()
+    yield flask_app
+
+
+@contextmanager
+def count_statements():
+    """Collect the SQL statements issued by this thread inside the block."""
+    statements = []
+    thread = threading.get_ident()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == thread:
+            statements.append(statement)
+
+    with flask_app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
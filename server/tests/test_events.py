@@ -0,0 +1,17 @@
+from events import EventBus
+
+
+def test_replay_history_keeps_only_the_most_recently_notified_users(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'EVENTS_REPLAY_USERS', 2)
+    bus = EventBus(app)
+    for user_id in (1, 2, 3):
+        bus.publish([user_id], 'comment', {'n': user_id})
+    bus.publish([2], 'comment', {'n': 4})
+    bus.publish([4], 'comment', {'n': 5})
+
+    # User 3 was notified before user 2's latest event, so it went first.
+    assert list(bus._history) == [2, 4]
+    subscription, missed = bus.subscribe(2, last_event_id=0)
+    assert [data['n'] for _, _, data in missed] == [2, 4]
+    subscription.close()
+    assert bus.subscribe(1, last_event_id=0)[1] == []
@@ -0,0 +1,52 @@
+from sqlalchemy import text
+import seed
+from conftest import count_statements
+from config import db
+from listings import list_posts, watchlist_entries
+from models import Comment, Post, Textbook, User, Watchlist
+
+POSTS = 50
+
+
+def listing_statements(app):
+    with app.app_context():
+        with count_statements() as statements:
+            posts = list_posts()
+        return len(posts), sum(len(post['comments']) for post in posts), len(statements)
+
+
+def test_post_listing_query_count_is_bounded(app):
+    with app.app_context():
+        seed.seed_scale(POSTS)
+    small = listing_statements(app)
+
+    with app.app_context():
+        seed.seed_scale(POSTS * 9)
+        assert Post.query.count() == POSTS * 10
+        assert Comment.query.count() > small[1]
+    large = listing_statements(app)
+
+    assert small[0] == POSTS and large[0] == POSTS * 10
+    assert large[1] > small[1]
+    # Posts with their user and textbook, then every comment with its author.
+    assert small[2] == large[2] == 2
+
+
+def test_watchlist_page_skips_entries_whose_post_is_gone(app):
+    with app.app_context():
+        user = User(email='watcher@school.edu', name='Watcher', _password_hash='x')
+        textbook = Textbook(author='A', title='T', isbn=9780000000001)
+        db.session.add_all([user, textbook])
+        db.session.flush()
+        posts = [Post(user_id=user.id, textbook_id=textbook.id, price=10, condition='Good') for _ in range(4)]
+        db.session.add_all(posts)
+        db.session.flush()
+        db.session.add_all(Watchlist(user_id=user.id, post_id=post.id, textbook_id=textbook.id) for post in posts)
+        db.session.commit()
+        user_id, live = user.id, [post.id for post in posts[2:]]
+        # SQLite doesn't enforce the foreign key, so the entries outlive their posts.
+        db.session.execute(text('DELETE FROM posts WHERE id IN (:a, :b)'), {'a': posts[0].id, 'b': posts[1].id})
+        db.session.commit()
+
+        assert [post.id for _, post, _ in watchlist_entries(user_id, limit=2)] == live
+        assert watchlist_entries(user_id + 1) is None
@@ -0,0 +1,38 @@
+from datetime import datetime
+import mailer
+from conftest import count_statements
+from config import db
+from models import OutboundEmail
+
+
+def outbox_queries(app):
+    with count_statements() as statements:
+        response = app.test_client().get('/metrics')
+    assert response.status_code == 200
+    return response.get_data(as_text=True), [s for s in statements if 'outbound_emails' in s]
+
+
+def test_scrapes_reuse_outbox_counts_until_they_expire(app, monkeypatch):
+    monkeypatch.setattr(mailer, '_status_counts', None)
+    monkeypatch.setitem(app.config, 'OUTBOX_METRICS_TTL', 60)
+    with app.app_context():
+        db.session.add(OutboundEmail(recipient='a@school.edu', subject='s', body='b', status='pending',
+                                     next_attempt_at=datetime.utcnow()))
+        db.session.commit()
+
+    body, queries = outbox_queries(app)
+    assert len(queries) == 1
+    assert 'outbox_emails{status="pending"} 1' in body
+
+    with app.app_context():
+        db.session.add(OutboundEmail(recipient='b@school.edu', subject='s', body='b', status='pending',
+                                     next_attempt_at=datetime.utcnow()))
+        db.session.commit()
+    body, queries = outbox_queries(app)
+    assert queries == []
+    assert 'outbox_emails{status="pending"} 1' in body
+
+    monkeypatch.setitem(app.config, 'OUTBOX_METRICS_TTL', 0)
+    body, queries = outbox_queries(app)
+    assert len(queries) == 1
+    assert 'outbox_emails{status="pending"} 2' in body
@@ -0,0 +1,56 @@
+import pytest
+import app as app_module
+from config import db
+from models import Comment, Notification, Post, Textbook, User, Watchlist
+
+
+@pytest.fixture(params=[False, True], ids=['direct', 'coalesced'])
+def listing(request, app, monkeypatch):
+    monkeypatch.setitem(app.config, 'WRITE_COALESCING', request.param)
+    with app.app_context():
+        seller = User(email='seller@school.edu', name='Seller', _password_hash='x')
+        buyer = User(email='buyer@school.edu', name='Buyer')
+        buyer.password_hash = 'password123'
+        textbook = Textbook(author='A', title='T', isbn=9780000000001)
+        db.session.add_all([seller, buyer, textbook])
+        db.session.flush()
+        post = Post(user_id=seller.id, textbook_id=textbook.id, price=40, condition='Good')
+        db.session.add(post)
+        db.session.commit()
+        ids = {'seller': seller.id, 'buyer': buyer.id, 'post': post.id, 'textbook': textbook.id}
+    client = app.test_client()
+    assert client.post('/login', json={'email': 'buyer@school.edu', 'password': 'password123'}).status_code == 200
+    return client, ids
+
+
+def add_comment(client, ids):
+    return client.post(f"/posts/{ids['post']}/comments", json={'text': 'Still available?'})
+
+
+def add_to_watchlist(client, ids):
+    return client.post(f"/users/{ids['buyer']}/watchlist",
+                       json={'post_id': ids['post'], 'textbook_id': ids['textbook']})
+
+
+@pytest.mark.parametrize('add', [add_comment, add_to_watchlist])
+def test_owner_is_notified(app, listing, add):
+    client, ids = listing
+    assert add(client, ids).status_code == 201
+    with app.app_context():
+        assert Notification.query.filter_by(user_id=ids['seller']).count() == 1
+        assert db.session.get(User, ids['seller']).unread_notifications == 1
+
+
+@pytest.mark.parametrize('add, model', [(add_comment, Comment), (add_to_watchlist, Watchlist)])
+def test_row_is_not_written_when_the_notification_fails(app, listing, monkeypatch, add, model):
+    client, ids = listing
+
+    def broken(*args):
+        raise RuntimeError("notification store unavailable")
+
+    monkeypatch.setattr(app_module, 'notify', broken)
+    assert add(client, ids).status_code == 500
+    with app.app_context():
+        assert model.query.count() == 0
+        assert db.session.get(Post, ids['post']).comment_count == 0
+        assert db.session.get(Post, ids['post']).watcher_count == 0
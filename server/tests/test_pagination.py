@@ -0,0 +1,112 @@
+import base64
+import json
+import pytest
+import seed
+from config import db
+from models import Comment, Post, Textbook, User
+from pagination import MAX_PAGE_SIZE, encode_cursor
+
+COLLECTIONS = [('/posts', Post), ('/comments', Comment), ('/users', User), ('/textbooks', Textbook)]
+
+
+@pytest.fixture
+def seeded(app):
+    with app.app_context():
+        # Enough for several pages of even the smallest collection (textbooks).
+        seed.seed_scale(200)
+    return app.test_client()
+
+
+def all_ids(app, model):
+    with app.app_context():
+        return [row_id for row_id, in db.session.query(model.id).order_by(model.id)]
+
+
+def walk(client, path, limit):
+    """Follow next_cursor from the first page; returns the ids of each page."""
+    pages, cursor = [], None
+    while True:
+        query = f'limit={limit}' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(f'{path}?{query}')
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        pages.append([item['id'] for item in body['items']])
+        cursor = body['next_cursor']
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize('path, model', COLLECTIONS)
+def test_pages_cover_every_row_once_in_order(app, seeded, path, model):
+    ids = all_ids(app, model)
+    assert len(ids) > 9
+    pages = walk(seeded, path, 3)
+    assert all(len(page) == 3 for page in pages[:-1]) and 0 < len(pages[-1]) <= 3
+    assert [row_id for page in pages for row_id in page] == ids
+
+
+@pytest.mark.parametrize('path, model', COLLECTIONS)
+def test_page_boundaries(app, seeded, path, model):
+    ids = all_ids(app, model)
+    # A limit that divides the collection exactly ends without an empty page.
+    limit = next(n for n in range(min(len(ids) // 2, MAX_PAGE_SIZE), 1, -1) if len(ids) % n == 0)
+    assert walk(seeded, path, limit) == [ids[i:i + limit] for i in range(0, len(ids), limit)]
+    if len(ids) < MAX_PAGE_SIZE:
+        assert walk(seeded, path, len(ids) + 1) == [ids]
+    # A cursor past the last row gives an empty final page.
+    body = seeded.get(f'{path}?limit=5&cursor={encode_cursor(ids[-1])}').get_json()
+    assert body == {'items': [], 'next_cursor': None}
+    # The cursor names the last row returned, and the next page starts after it.
+    first = seeded.get(f'{path}?limit=3').get_json()
+    assert first['next_cursor'] == encode_cursor(ids[2])
+    assert [item['id'] for item in seeded.get(f"{path}?limit=3&cursor={first['next_cursor']}").get_json()['items']] == ids[3:6]
+
+
+def test_limit_is_capped_and_validated(app, seeded):
+    with app.app_context():
+        seed.seed_scale(10)
+    assert len(seeded.get(f'/posts?limit={MAX_PAGE_SIZE * 5}').get_json()['items']) == MAX_PAGE_SIZE
+    for limit in ('0', '-1', 'ten'):
+        assert seeded.get(f'/posts?limit={limit}').status_code == 400
+
+
+def raw_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip('=')
+
+
+MALFORMED = ['not a cursor!', 'e30', raw_cursor({'id': '5'}), raw_cursor({'last': 5}), raw_cursor([5]),
+             raw_cursor({'id': 1.5}), raw_cursor({'id': True}), '%ff%fe']
+
+
+@pytest.mark.parametrize('path, model', COLLECTIONS)
+@pytest.mark.parametrize('cursor', MALFORMED)
+def test_malformed_cursor_is_rejected(app, path, model, cursor):
+    response = app.test_client().get(f'{path}?limit=5&cursor={cursor}')
+    assert response.status_code == 400
+    assert response.get_json() == {'message': 'Invalid cursor.'}
+
+
+def test_pages_are_stable_under_concurrent_inserts_and_deletes(app, seeded):
+    before = all_ids(app, Post)
+    first = seeded.get('/posts?limit=10').get_json()
+    assert [item['id'] for item in first['items']] == before[:10]
+
+    # Between page requests, other clients add listings and remove one
+    # already served (the cursor's own row) and one not yet served.
+    with app.app_context():
+        post = db.session.get(Post, before[0])
+        added = [Post(user_id=post.user_id, textbook_id=post.textbook_id, price=5, condition='New') for _ in range(3)]
+        db.session.add_all(added)
+        db.session.delete(db.session.get(Post, before[9]))
+        db.session.delete(db.session.get(Post, before[15]))
+        db.session.commit()
+        added_ids = [p.id for p in added]
+
+    rest, cursor = [], first['next_cursor']
+    while cursor:
+        body = seeded.get(f'/posts?limit=10&cursor={cursor}').get_json()
+        rest += [item['id'] for item in body['items']]
+        cursor = body['next_cursor']
+
+    # No row repeats or is skipped; the new rows come last, in order.
+    assert rest == [row_id for row_id in before[10:] if row_id != before[15]] + added_ids
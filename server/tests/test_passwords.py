@@ -0,0 +1,46 @@
+import time
+import bcrypt
+import pytest
+import passwords
+from models import User
+from passwords import PasswordHasher, PasswordHasherBusy
+
+
+@pytest.fixture
+def hasher(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_WORKERS', 1)
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_MAX_PENDING', 1)
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_TIMEOUT', 10)
+    hasher = PasswordHasher(app)
+    yield hasher
+    if hasher._pool is not None:
+        hasher._pool.shutdown(cancel_futures=True)
+
+
+def test_timed_out_call_is_busy_and_keeps_its_slot_until_done(app, hasher, monkeypatch):
+    assert hasher._call(abs, -1) == 1
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_TIMEOUT', 0.2)
+
+    with pytest.raises(PasswordHasherBusy):
+        hasher._call(time.sleep, 1)
+    assert hasher.timed_out == 1
+    # The worker is still sleeping, so its slot is still taken.
+    with pytest.raises(PasswordHasherBusy):
+        hasher._call(abs, -2)
+    assert hasher.rejected == 1
+
+    time.sleep(1)
+    assert hasher._call(abs, -3) == 3
+
+
+def test_login_succeeds_when_the_rehash_cannot_run(app, monkeypatch):
+    stale = bcrypt.hashpw(b'password123', bcrypt.gensalt(rounds=4)).decode('utf-8')
+    monkeypatch.setitem(app.config, 'BCRYPT_LOG_ROUNDS', 5)
+
+    def busy(password):
+        raise PasswordHasherBusy("Too many password checks in progress")
+
+    monkeypatch.setattr(passwords.password_hasher, 'hash', busy)
+    user = User(email='seller@school.edu', name='Seller', _password_hash=stale)
+    assert user.authenticate('password123')
+    assert user.password_hash == stale
@@ -0,0 +1,55 @@
+from sqlalchemy import text
+from config import db
+from models import Post, Textbook, User
+
+ISBN = 9780000000001
+
+
+def create_post(client, user_id, isbn):
+    form = {'user_id': user_id, 'isbn': isbn, 'price': '40', 'condition': 'Good', 'title': 'Fresh'}
+    response = client.post('/posts', data=form)
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()
+
+
+def seed_user(app):
+    with app.app_context():
+        user = User(email='seller@school.edu', name='Seller', _password_hash='x')
+        db.session.add(user)
+        db.session.add(Textbook(author='A', title='Original', isbn=ISBN))
+        db.session.commit()
+        return user.id
+
+
+def test_listing_after_its_textbook_was_deleted_creates_a_new_one(app):
+    user_id = seed_user(app)
+    client = app.test_client()
+    create_post(client, user_id, ISBN)
+
+    with app.app_context():
+        db.session.execute(text('DELETE FROM posts'))
+        db.session.execute(text('DELETE FROM textbooks'))
+        db.session.commit()
+
+    second = create_post(client, user_id, ISBN)
+    assert second['textbook']['title'] == 'Fresh'
+    with app.app_context():
+        assert db.session.get(Textbook, second['textbook_id']).isbn == ISBN
+    assert client.get('/posts').status_code == 200
+
+
+def test_listing_after_its_textbook_was_renumbered_creates_a_new_one(app):
+    user_id = seed_user(app)
+    client = app.test_client()
+    first = create_post(client, user_id, ISBN)
+
+    with app.app_context():
+        db.session.execute(text('UPDATE textbooks SET isbn = :isbn'), {'isbn': ISBN + 1})
+        db.session.commit()
+
+    second = create_post(client, user_id, ISBN)
+    assert second['textbook_id'] != first['textbook_id']
+    assert second['textbook']['isbn'] == ISBN
+    with app.app_context():
+        assert db.session.get(Post, first['id']).textbook.isbn == ISBN + 1
+
@@ -0,0 +1,22 @@
+import pytest
+import query_plans
+from conftest import empty_database, flask_app
+from config import db
+
+
+@pytest.fixture(scope='module')
+def results():
+    empty_database()
+    return {label: (status, statements) for label, _, _, status, statements in query_plans.run_checks()}
+
+
+@pytest.mark.parametrize('label', [check[0] for check in query_plans.CHECKS])
+def test_no_full_table_scan(results, label):
+    status, statements = results[label]
+    assert status < 500
+    with flask_app.app_context():
+        with db.engine.connect() as connection:
+            problems = query_plans.plan_problems(connection, statements)
+    assert not problems, '\n'.join(
+        ' '.join(statement.split()) + '\n  -> ' + '\n  -> '.join(details) for statement, details in problems
+    )
@@ -0,0 +1,191 @@
+import pytest
+from config import db
+from models import Comment, Post, Textbook, User, Watchlist
+from response_cache import response_cache
+
+PASSWORD = 'password123'
+
+
+@pytest.fixture
+def listing(app, monkeypatch):
+    """Two of a seller's posts; a buyer commented on and watches the first.
+
+    The buyer is logged in and the response cache is on.
+    """
+    monkeypatch.setitem(app.config, 'RESPONSE_CACHE_ENABLED', True)
+    monkeypatch.setitem(app.config, 'BCRYPT_LOG_ROUNDS', 4)
+    with app.app_context():
+        seller, buyer, spare = (User(email=f'{name}@school.edu', name=name.title()) for name in ('seller', 'buyer', 'spare'))
+        seller.password_hash = PASSWORD
+        buyer._password_hash = spare._password_hash = seller._password_hash
+        textbook = Textbook(author='A', title='T', isbn=9780000000001)
+        unused = Textbook(author='B', title='U', isbn=9780000000002)
+        db.session.add_all([seller, buyer, spare, textbook, unused])
+        db.session.flush()
+        post, other = (Post(user_id=seller.id, textbook_id=textbook.id, price=40, condition='Good') for _ in range(2))
+        db.session.add_all([post, other])
+        db.session.flush()
+        comment = Comment(user_id=buyer.id, post_id=post.id, text='Still available?')
+        db.session.add_all([
+            comment,
+            Comment(user_id=spare.id, post_id=post.id, text='Interested'),
+            Watchlist(user_id=buyer.id, post_id=post.id, textbook_id=textbook.id),
+        ])
+        post.comment_count, post.watcher_count = 2, 1
+        db.session.commit()
+        ids = {
+            'seller': seller.id, 'buyer': buyer.id, 'spare': spare.id, 'post': post.id, 'other': other.id,
+            'textbook': textbook.id, 'unused': unused.id, 'comment': comment.id,
+        }
+    client = app.test_client()
+    login(client, 'buyer@school.edu')
+    return client, ids
+
+
+def login(client, email):
+    assert client.post('/login', json={'email': email, 'password': PASSWORD}).status_code == 200
+
+
+def as_seller(client):
+    client.post('/logout')
+    login(client, 'seller@school.edu')
+
+
+def create_post(client, ids):
+    form = {'user_id': ids['seller'], 'isbn': '9780000000099', 'price': '30', 'condition': 'Fair',
+            'title': 'New', 'author': 'N'}
+    return client.post('/posts', data=form)
+
+
+def update_post(client, ids):
+    as_seller(client)
+    return client.put(f"/posts/{ids['post']}", data={'price': '35', 'title': 'Renamed'})
+
+
+def delete_post(client, ids):
+    as_seller(client)
+    return client.delete(f"/posts/{ids['post']}")
+
+
+def bulk_create_posts(client, ids):
+    return client.post('/posts/bulk', json=[
+        {'user_id': ids['seller'], 'isbn': '9780000000001', 'price': '25', 'condition': 'Good'},
+        {'user_id': ids['seller'], 'isbn': '9780000000098', 'price': '25', 'condition': 'Good',
+         'title': 'Bulk', 'author': 'B'},
+    ])
+
+
+def create_textbook(client, ids):
+    return client.post('/textbooks', data={'author': 'C', 'title': 'V', 'isbn': '9780000000097'})
+
+
+def delete_textbook(client, ids):
+    return client.delete(f"/textbooks/{ids['unused']}")
+
+
+def delete_user(client, ids):
+    return client.delete(f"/users/{ids['spare']}")
+
+
+def add_comment(client, ids):
+    return client.post(f"/posts/{ids['post']}/comments", json={'text': 'Would you take 30?'})
+
+
+def delete_comment(client, ids):
+    return client.delete(f"/posts/{ids['post']}/comments/{ids['comment']}")
+
+
+def watch(client, ids):
+    return client.post(f"/users/{ids['buyer']}/watchlist", json={'post_id': ids['other'], 'textbook_id': ids['textbook']})
+
+
+def unwatch(client, ids):
+    return client.delete(f"/users/{ids['buyer']}/watchlist/{ids['post']}")
+
+
+def sign_up(client, ids):
+    client.post('/logout')
+    return client.post('/signup', json={'email': 'new@school.edu', 'name': 'New', 'password': PASSWORD})
+
+
+POST_READS = ['/posts', '/posts?limit=10', '/posts/{post}']
+COMMENT_READS = ['/comments', '/comments?limit=10', '/posts/{post}/comments']
+WATCHLIST_READ = '/users/{buyer}/watchlist'
+
+# (write, cached reads whose body the write must change)
+WRITES = [
+    (create_post, ['/posts', '/posts?limit=10', '/textbooks', '/textbooks?limit=10']),
+    (update_post, POST_READS + COMMENT_READS + [WATCHLIST_READ, '/textbooks', '/textbooks/{textbook}']),
+    (delete_post, POST_READS + COMMENT_READS + [WATCHLIST_READ]),
+    (bulk_create_posts, ['/posts', '/posts?limit=10', '/textbooks']),
+    (create_textbook, ['/textbooks', '/textbooks?limit=10']),
+    (delete_textbook, ['/textbooks', '/textbooks?limit=10', '/textbooks/{unused}']),
+    (delete_user, ['/users', '/users?limit=10', '/posts/{post}', '/posts'] + COMMENT_READS),
+    (add_comment, POST_READS + COMMENT_READS + [WATCHLIST_READ]),
+    (delete_comment, POST_READS + COMMENT_READS + [WATCHLIST_READ]),
+    (watch, ['/posts', '/posts?limit=10', WATCHLIST_READ]),
+    (unwatch, POST_READS + COMMENT_READS + [WATCHLIST_READ]),
+    (sign_up, ['/users', '/users?limit=10']),
+]
+
+
+def read(client, path):
+    response = client.get(path)
+    return response.status_code, response.get_data()
+
+
+@pytest.mark.parametrize('write, paths', WRITES, ids=[write.__name__ for write, _ in WRITES])
+def test_write_refreshes_cached_reads(listing, write, paths):
+    client, ids = listing
+    paths = [path.format(**ids) for path in paths]
+    before = {}
+    for path in paths:
+        before[path] = read(client, path)
+        assert before[path][0] == 200, path
+        hits = response_cache.hits
+        assert read(client, path) == before[path]
+        assert response_cache.hits == hits + 1, f"{path} was not served from the cache"
+
+    assert write(client, ids).status_code in (200, 201)
+
+    stale = [path for path in paths if read(client, path) == before[path]]
+    assert stale == []
+
+
+# (tag, change made behind the cache's back, lists embedding that entity)
+ENTITY_CHANGES = [
+    ('post:{post}', lambda ids: db.session.get(Post, ids['post']).__setattr__('price', 1),
+     ['/posts', '/posts?limit=10', WATCHLIST_READ] + COMMENT_READS),
+    ('user:{spare}', lambda ids: db.session.get(User, ids['spare']).__setattr__('name', 'Renamed'),
+     ['/posts', '/posts?limit=10', '/users', '/users?limit=10'] + COMMENT_READS),
+    ('textbook:{textbook}', lambda ids: db.session.get(Textbook, ids['textbook']).__setattr__('title', 'Renamed'),
+     ['/textbooks', '/textbooks?limit=10', WATCHLIST_READ]),
+]
+
+
+@pytest.mark.parametrize('tag, change, paths', ENTITY_CHANGES, ids=[tag.split(':')[0] for tag, _, _ in ENTITY_CHANGES])
+def test_lists_are_tagged_with_the_entities_they_embed(app, listing, tag, change, paths):
+    client, ids = listing
+    paths = [path.format(**ids) for path in paths]
+    before = {path: read(client, path) for path in paths}
+    with app.app_context():
+        change(ids)
+        db.session.commit()
+
+    response_cache.invalidate(tag.format(**ids))
+    stale = [path for path in paths if read(client, path) == before[path]]
+    assert stale == []
+
+
+def test_comment_list_sees_watchlist_changes(listing):
+    client, ids = listing
+
+    def embedded_watchers():
+        return {comment['post']['id']: comment['post']['watcher_count'] for comment in client.get('/comments').get_json()}
+
+    assert embedded_watchers() == {ids['post']: 1}
+    assert client.delete(f"/users/{ids['buyer']}/watchlist/{ids['post']}").status_code == 200
+    assert embedded_watchers() == {ids['post']: 0}
+    watch_again = {'post_id': ids['post'], 'textbook_id': ids['textbook']}
+    assert client.post(f"/users/{ids['buyer']}/watchlist", json=watch_again).status_code == 201
+    assert embedded_watchers() == {ids['post']: 1}
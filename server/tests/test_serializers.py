@@ -0,0 +1,62 @@
+import json
+from datetime import datetime
+import pytest
+from sqlalchemy_serializer import SerializerMixin
+from config import db
+from listings import list_posts
+from models import Comment, Notification, OutboundEmail, Post, Textbook, User, Watchlist
+from serializers import FastSerializerMixin
+
+MODELS = [User, Textbook, Post, Comment, Watchlist, Notification, OutboundEmail]
+
+
+@pytest.fixture
+def rows(app):
+    with app.app_context():
+        user = User(email='seller@school.edu', name='Seller', _password_hash='x')
+        buyer = User(email='buyer@school.edu', name=None, _password_hash='x')
+        textbook = Textbook(author='Author', title='Title', subject='Physics', isbn=9780000000001)
+        db.session.add_all([user, buyer, textbook])
+        db.session.flush()
+        posts = [
+            Post(user_id=user.id, textbook_id=textbook.id, price=40, condition='Good', img='textbook_covers/a'),
+            Post(user_id=user.id, textbook_id=textbook.id, price=None, condition='Fair'),
+        ]
+        db.session.add_all(posts)
+        db.session.flush()
+        db.session.add_all([
+            Comment(user_id=buyer.id, post_id=posts[0].id, text='Still available?'),
+            Comment(user_id=user.id, post_id=posts[0].id, text='Yes'),
+            Watchlist(user_id=buyer.id, post_id=posts[0].id, textbook_id=textbook.id),
+            Notification(user_id=user.id, post_id=posts[0].id, kind='comment', message='New comment'),
+            Notification(user_id=user.id, post_id=None, kind='watch', message='Watched', read=True),
+            OutboundEmail(recipient='buyer@school.edu', subject='S', body='B', status='sent', attempts=1,
+                          next_attempt_at=datetime(2024, 1, 1), sent_at=datetime(2024, 1, 1, 9, 30)),
+        ])
+        db.session.commit()
+        yield
+
+
+@pytest.mark.parametrize('model', MODELS, ids=lambda model: model.__name__)
+def test_compiled_output_matches_mixin(rows, model):
+    instances = model.query.all()
+    assert instances
+    for instance in instances:
+        old = SerializerMixin.to_dict(instance)
+        new = FastSerializerMixin.to_dict(instance)
+        assert json.dumps(old) == json.dumps(new)
+
+
+def test_listing_matches_mixin(rows):
+    def reference(post):
+        data = SerializerMixin.to_dict(post)
+        data['image_variants'] = post.image_variants
+        data['user'] = SerializerMixin.to_dict(post.user)
+        data['textbook'] = SerializerMixin.to_dict(post.textbook)
+        data['comments'] = [SerializerMixin.to_dict(comment) for comment in post.comments]
+        return data
+
+    listing = list_posts()
+    assert [len(post['comments']) for post in listing] == [2, 0]
+    expected = [reference(post) for post in Post.query.order_by(Post.id)]
+    assert json.dumps(listing) == json.dumps(expected)
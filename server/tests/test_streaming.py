@@ -0,0 +1,55 @@
+import json
+import pytest
+import seed
+import streaming
+from config import db
+from listings import list_posts
+from models import Comment, Post, Textbook
+
+
+@pytest.fixture
+def seeded(app, monkeypatch):
+    # Small batches so every stream crosses several batch boundaries.
+    monkeypatch.setattr(streaming, 'STREAM_BATCH_SIZE', 7)
+    with app.app_context():
+        seed.seed_scale(30)
+        user_id = db.session.query(Post.user_id).order_by(Post.id).first()[0]
+    return user_id
+
+
+def stream(client, path, **kwargs):
+    response = client.get(path, **kwargs)
+    assert response.status_code == 200
+    assert response.mimetype == streaming.NDJSON_MIMETYPE
+    body = response.get_data(as_text=True)
+    assert body.endswith('\n')
+    return [json.loads(line) for line in body.splitlines()]
+
+
+def test_streamed_posts_match_the_listing(app, seeded):
+    client = app.test_client()
+    lines = stream(client, '/posts?stream=1')
+    with app.app_context():
+        assert lines == list_posts()
+        assert len(lines) == Post.query.count()
+
+    mine = stream(client, f'/posts?stream=1&user_id={seeded}')
+    assert mine and all(post['user_id'] == seeded for post in mine)
+    assert mine == [post for post in lines if post['user_id'] == seeded]
+
+
+@pytest.mark.parametrize('path, model', [('/textbooks', Textbook), ('/comments', Comment)])
+def test_streamed_collections_cover_every_row_in_order(app, seeded, path, model):
+    lines = stream(app.test_client(), path, headers={'Accept': streaming.NDJSON_MIMETYPE})
+    with app.app_context():
+        expected = [row.to_dict() for row in model.query.order_by(model.id)]
+    assert [line['id'] for line in lines] == [row['id'] for row in expected]
+    assert lines == expected
+
+
+def test_streamed_post_comments(app, seeded):
+    with app.app_context():
+        post_id = Post.query.order_by(Post.id).first().id
+    lines = stream(app.test_client(), f'/posts/{post_id}/comments?stream=1')
+    with app.app_context():
+        assert [line['id'] for line in lines] == [c.id for c in Comment.query.filter_by(post_id=post_id).order_by(Comment.id)]
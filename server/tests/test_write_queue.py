@@ -0,0 +1,69 @@
+from concurrent.futures import Future
+import pytest
+from config import db
+from models import Comment, Post, Textbook, User
+import write_queue
+from write_queue import WriteQueueTimeout, insert_row
+
+
+@pytest.fixture
+def coalescing(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'WRITE_COALESCING', True)
+    with app.app_context():
+        user = User(email='seller@school.edu', name='Seller', _password_hash='x')
+        textbook = Textbook(author='A', title='T', isbn=9780000000001)
+        db.session.add_all([user, textbook])
+        db.session.flush()
+        post = Post(user_id=user.id, textbook_id=textbook.id, price=40, condition='Good')
+        db.session.add(post)
+        db.session.commit()
+        return user.id, post.id
+
+
+def test_insert_after_caller_writes_stays_in_callers_transaction(app, coalescing, monkeypatch):
+    user_id, post_id = coalescing
+    monkeypatch.setattr(write_queue.write_queue, 'submit', lambda *args: pytest.fail("went through the writer"))
+    with app.app_context():
+        db.session.get(Post, post_id).price = 5
+        db.session.flush()
+        comment = insert_row(Comment, text='Lower?', user_id=user_id, post_id=post_id)
+        comment_id = comment.id
+
+    with app.app_context():
+        assert db.session.get(Post, post_id).price == 5
+        assert db.session.get(Comment, comment_id) is not None
+
+
+def test_insert_from_read_only_caller_goes_through_the_writer(app, coalescing):
+    user_id, post_id = coalescing
+    with app.app_context():
+        db.session.get(Post, post_id)
+        comment = insert_row(Comment, text='Still available?', user_id=user_id, post_id=post_id)
+        assert comment.text == 'Still available?'
+    assert write_queue.write_queue.rows >= 1
+
+
+def test_timed_out_insert_is_cancelled(app, coalescing, monkeypatch):
+    user_id, post_id = coalescing
+    future = Future()
+    monkeypatch.setitem(app.config, 'WRITE_COALESCE_TIMEOUT', 0.01)
+    monkeypatch.setattr(write_queue.write_queue, 'submit', lambda *args: future)
+    with app.app_context():
+        with pytest.raises(WriteQueueTimeout):
+            insert_row(Comment, text='Hello', user_id=user_id, post_id=post_id)
+    assert future.cancelled()
+
+
+def test_comment_endpoint_answers_503_when_the_writer_times_out(app, coalescing, monkeypatch):
+    user_id, post_id = coalescing
+    with app.app_context():
+        db.session.get(User, user_id).password_hash = 'password123'
+        db.session.commit()
+    client = app.test_client()
+    assert client.post('/login', json={'email': 'seller@school.edu', 'password': 'password123'}).status_code == 200
+
+    monkeypatch.setitem(app.config, 'WRITE_COALESCE_TIMEOUT', 0.01)
+    monkeypatch.setattr(write_queue.write_queue, 'submit', lambda *args: Future())
+    response = client.post(f'/posts/{post_id}/comments', json={'text': 'Hello'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
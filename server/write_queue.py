@@ -0,0 +1,192 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from config import app, db
+
+logger = logging.getLogger(__name__)
+
+
+class WriteQueueTimeout(Exception):
+    """Raised when the writer hasn't committed a queued row within WRITE_COALESCE_TIMEOUT."""
+
+
+class WriteQueue:
+    """Single writer thread that commits queued inserts in groups.
+
+    Request threads hand over ``(model, values)`` and wait on a future for
+    the new row's id. The writer collects whatever arrives within
+    WRITE_COALESCE_INTERVAL_MS (up to WRITE_COALESCE_MAX_BATCH rows) and
+    commits it as one transaction, so SQLite sees one writer and one fsync
+    per group instead of one per request. If a group fails, its rows are
+    retried one at a time so only the offending insert gets the error.
+    Rows whose caller stopped waiting (and cancelled the future) are
+    skipped.
+
+    Experimental: in bench_engine.py runs so far (SQLite in WAL mode with
+    synchronous NORMAL and FULL) it has shown no consistent write-throughput
+    gain over committing per request, so it stays off by default.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='write-queue', daemon=True)
+            self._thread.start()
+
+    def submit(self, model, values, on_insert=None):
+        future = Future()
+        self.start()
+        self._queue.put((model, values, on_insert, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.app.config['WRITE_COALESCE_INTERVAL_MS'] / 1000
+        max_batch = self.app.config['WRITE_COALESCE_MAX_BATCH']
+        while len(batch) < max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = [item for item in self._collect() if item[3].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            with self.app.app_context():
+                try:
+                    self._commit_group(batch)
+                except Exception:
+                    db.session.rollback()
+                    logger.warning("Grouped insert of %d rows failed; retrying one by one", len(batch), exc_info=True)
+                    for item in batch:
+                        self._commit_one(item)
+                finally:
+                    db.session.remove()
+
+    def _commit_group(self, batch):
+        rows = [model(**values) for model, values, _, _ in batch]
+        db.session.add_all(rows)
+        db.session.flush()
+        for (_, _, on_insert, _), row in zip(batch, rows):
+            if on_insert is not None:
+                on_insert(row)
+        ids = [row.id for row in rows]
+        db.session.commit()
+        self.batches += 1
+        self.rows += len(rows)
+        for (_, _, _, future), row_id in zip(batch, ids):
+            future.set_result(row_id)
+
+    def _commit_one(self, item):
+        model, values, on_insert, future = item
+        try:
+            row = model(**values)
+            db.session.add(row)
+            db.session.flush()
+            if on_insert is not None:
+                on_insert(row)
+            row_id = row.id
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            future.set_exception(e)
+        else:
+            self.batches += 1
+            self.rows += 1
+            future.set_result(row_id)
+
+
+write_queue = WriteQueue(app)
+
+_WROTE = 'write_queue.wrote'
+
+
+@event.listens_for(Session, 'after_flush')
+def _flushed(session, flush_context):
+    session.info[_WROTE] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _executed(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[_WROTE] = True
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _transaction_ended(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(_WROTE, None)
+
+
+def has_writes(session):
+    """Whether ``session``'s transaction holds (or is about to flush) any writes.
+
+    Tracks ORM flushes and insert/update/delete statements run through
+    ``session.execute``; raw ``text()`` DML is not seen.
+    """
+    return bool(session.new or session.dirty or session.deleted or session.info.get(_WROTE))
+
+
+def _wait(future):
+    timeout = app.config['WRITE_COALESCE_TIMEOUT']
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        pass
+    if future.cancel():
+        raise WriteQueueTimeout("The write was not applied; please retry")
+    # The writer had already taken the row; give its commit as long again.
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        raise WriteQueueTimeout("The write is taking too long and may still be applied")
+
+
+def insert_row(model, on_insert=None, **values):
+    """Insert one ``model`` row, commit it and return it from the current session.
+
+    With WRITE_COALESCING on, the insert goes through the group-commit
+    writer; otherwise it is added and committed right here, as before.
+    ``on_insert(row)``, if given, runs after the row is flushed and before
+    the commit, in whichever session and thread commits it, so any writes
+    it makes land in the same transaction as the row.
+
+    If the caller's session already holds writes, the row is committed
+    here with them even when coalescing is on, so they stay one
+    transaction. Raises WriteQueueTimeout if the writer doesn't commit the
+    row within WRITE_COALESCE_TIMEOUT.
+    """
+    if not app.config['WRITE_COALESCING'] or has_writes(db.session):
+        row = model(**values)
+        db.session.add(row)
+        if on_insert is not None:
+            db.session.flush()
+            on_insert(row)
+        db.session.commit()
+        return row
+
+    # The caller has only read so far, so this commit just ends its read
+    # transaction: the request gives its pooled connection back while it
+    # waits (the writer needs one), and the next read sees the writer's commit.
+    db.session.commit()
+    row_id = _wait(write_queue.submit(model, values, on_insert))
+    return db.session.get(model, row_id)